@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # Connect the signal handlers that keep the search and autocomplete
+        # indexes, the connection graph, the profile cache and home timelines
+        # up to date, and publish events
+        import api.search  # noqa
+        import api.autocomplete  # noqa
+        import api.graph  # noqa
+        import api.profile_cache  # noqa
+        import api.timeline  # noqa
+        import api.events  # noqa
@@ -0,0 +1,14 @@
+from rest_framework.authentication import TokenAuthentication
+
+
+class QueryStringTokenAuthentication(TokenAuthentication, ):
+    """
+    Token authentication from a ?token= parameter, for clients such as
+    EventSource that cannot set an Authorization header
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get('token', None)
+        if not key:
+            return None
+        return self.authenticate_credentials(key)
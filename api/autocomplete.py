@@ -0,0 +1,168 @@
+"""
+An in-process prefix index for search-as-you-type.
+
+Each worker keeps a sorted array of the profile names, usernames, job
+positions, company names and skill names in the database and answers
+prefix queries with a binary search, so completions never touch the
+database. The index is built the first time it is used (wsgi.py warms it up
+at worker start) and then patched by the signal handlers below whenever one
+of those rows is saved or deleted, once the change is committed. Writes handled by other workers are not
+seen by these handlers, so once the index is older than
+settings.AUTOCOMPLETE_MAX_AGE seconds a background thread rebuilds it while
+completions keep being served from the old one.
+"""
+from bisect import bisect_left, insort
+from threading import RLock, Thread
+from time import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+from api.models import Profile, JobPosting, Company, Skill
+
+
+# The kinds of completion, the model they come from and the field holding
+# the term
+SOURCES = [
+    ('profiles', Profile, 'full_name'),
+    ('usernames', User, 'username'),
+    ('jobs', JobPosting, 'position'),
+    ('companies', Company, 'name'),
+    ('skills', Skill, 'name'),
+]
+
+
+class PrefixIndex(object, ):
+    """
+    A sorted array of (lowercased term, kind, term) keys. Several rows may
+    share a key (many profiles have the skill "Python"), so each key keeps a
+    count of the rows using it and is only dropped when that reaches zero.
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+        self.rebuilding = False
+        self.clear()
+
+    def clear(self):
+        self.keys = []
+        self.counts = {}
+        self.rows = {}
+        self.built = None
+
+    def build(self):
+        """
+        Reads every term into a new index and then swaps it in, so the old
+        one can be read until then
+        """
+        fresh = PrefixIndex()
+        for kind, model, field in SOURCES:
+            for pk, term in model.objects.values_list('pk', field).iterator():
+                fresh._add(kind, pk, term)
+        fresh.keys.sort()
+
+        with self.lock:
+            self.keys, self.counts, self.rows = fresh.keys, fresh.counts, fresh.rows
+            self.built = time()
+
+    def rebuild(self):
+        try:
+            self.build()
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def ensure_built(self):
+        """
+        Builds the index if it never has been, or starts rebuilding it in
+        the background if it is too old
+        """
+        if self.built is None:
+            self.build()
+            return
+
+        with self.lock:
+            if self.rebuilding or time() - self.built <= settings.AUTOCOMPLETE_MAX_AGE:
+                return
+            self.rebuilding = True
+        Thread(target=self.rebuild, daemon=True).start()
+
+    def _add(self, kind, pk, term, keep_sorted=False):
+        term = term.strip()
+        if not term:
+            return
+
+        key = (term.lower(), kind, term)
+        self.rows[(kind, pk)] = key
+        if key in self.counts:
+            self.counts[key] += 1
+        else:
+            self.counts[key] = 1
+            if keep_sorted:
+                insort(self.keys, key)
+            else:
+                self.keys.append(key)
+
+    def _remove(self, kind, pk):
+        key = self.rows.pop((kind, pk), None)
+        if key is None:
+            return
+
+        self.counts[key] -= 1
+        if not self.counts[key]:
+            del self.counts[key]
+            del self.keys[bisect_left(self.keys, key)]
+
+    def update(self, kind, pk, term):
+        with self.lock:
+            if self.built is None:
+                return
+            self._remove(kind, pk)
+            self._add(kind, pk, term, keep_sorted=True)
+
+    def remove(self, kind, pk):
+        with self.lock:
+            if self.built is None:
+                return
+            self._remove(kind, pk)
+
+    def complete(self, prefix, limit):
+        """
+        Returns up to limit (term, kind) pairs whose term starts with prefix,
+        ignoring case, in alphabetical order
+        """
+        self.ensure_built()
+
+        prefix = prefix.strip().lower()
+        with self.lock:
+            ret = []
+            i = bisect_left(self.keys, (prefix,))
+            while i < len(self.keys) and len(ret) < limit and self.keys[i][0].startswith(prefix):
+                ret.append((self.keys[i][2], self.keys[i][1]))
+                i += 1
+            return ret
+
+
+index = PrefixIndex()
+
+
+def connect_signals(kind, model, field):
+
+    def saved(sender, instance, raw=False, **kwargs):
+        if not raw:
+            pk, term = instance.pk, getattr(instance, field)
+            transaction.on_commit(lambda: index.update(kind, pk, term))
+
+    def deleted(sender, instance, **kwargs):
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove(kind, pk))
+
+    # weak=False since the handlers are closures with no other reference
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid='autocomplete-saved-' + kind)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid='autocomplete-deleted-' + kind)
+
+
+for kind, model, field in SOURCES:
+    connect_signals(kind, model, field)
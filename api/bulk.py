@@ -0,0 +1,96 @@
+"""
+Applies a batch of creates, updates and deletes to the skills, education or
+employment of a profile in a handful of queries.
+
+The rows are written with bulk_create and one UPDATE ... CASE statement,
+neither of which send the post_save signals that keep the search index,
+the autocomplete index and the profile cache current, so apply_changes
+updates those itself once the changes are committed. Rows are deleted with
+QuerySet.delete(), which sends post_delete for each of them as usual.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, When, Value
+from django.utils import timezone
+
+from api import profile_cache
+from api.autocomplete import index as autocomplete_index
+from api.models import Skill, SearchEntry
+
+
+def bulk_update(model, objects, fields):
+    """
+    Saves fields of objects in a single UPDATE, setting each field with a
+    CASE on the primary key
+    """
+    if not objects:
+        return
+
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        whens = [When(pk=obj.pk, then=Value(getattr(obj, field.attname), output_field=field)) for obj in objects]
+        values[field.attname] = Case(*whens, output_field=field)
+
+    now = timezone.now()
+    for obj in objects:
+        obj.updated = now
+    values['updated'] = now
+
+    model.objects.filter(pk__in=[obj.pk for obj in objects]).update(**values)
+
+
+def insert(model, objects):
+    """
+    Inserts objects, setting their primary keys. Only some databases return
+    the keys of bulk inserted rows, elsewhere the rows are saved one by one.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        model.objects.bulk_create(objects)
+    else:
+        for obj in objects:
+            obj.save(force_insert=True)
+
+
+def index_skills(profile, skills):
+    """
+    Refreshes the search and autocomplete entries of skills
+    """
+    with transaction.atomic():
+        SearchEntry.objects.filter(subtype='skills', object_id__in=[skill.pk for skill in skills]).delete()
+        SearchEntry.objects.bulk_create([SearchEntry(
+            subtype='skills',
+            object_id=skill.pk,
+            profile=profile,
+            username=profile.user.username,
+            text=skill.name,
+            visible_id=profile.full_name,
+            match=skill.name,
+        ) for skill in skills])
+
+    for skill in skills:
+        autocomplete_index.update('skills', skill.pk, skill.name)
+
+
+def apply_changes(profile, model, created, updated, deleted_ids):
+    """
+    Inserts created, saves the given fields of the updated (object, fields)
+    pairs and deletes the rows in deleted_ids, all belonging to profile, in
+    one transaction. The search and autocomplete entries of skills are
+    refreshed once it commits.
+    """
+    with transaction.atomic():
+        insert(model, created)
+
+        fields = set()
+        for obj, changed in updated:
+            fields.update(changed)
+        bulk_update(model, [obj for obj, changed in updated], sorted(fields))
+
+        if deleted_ids:
+            model.objects.filter(profile=profile, pk__in=deleted_ids).delete()
+
+        if model is Skill:
+            skills = created + [obj for obj, changed in updated]
+            transaction.on_commit(lambda: index_skills(profile, skills))
+
+        profile_cache.invalidate([profile.pk])
@@ -0,0 +1,87 @@
+"""
+Conditional GET support for detail views.
+
+Each decorated view names a cheap query for the `updated` timestamp of the
+object it shows. The timestamp is sent as Last-Modified and, together with
+the object's id and what tells apart the representations of one version
+(the query string, e.g. ?fields=, and the negotiated media type), as a
+strong ETag, and Django's condition decorator answers 304 Not Modified when
+the client already has that version, before the view runs any of its own
+queries.
+"""
+from hashlib import md5
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from api.models import Profile, JobPosting, Company, CompanyManager
+
+
+def profile_version(request, username=None, **kwargs):
+    # Profile.updated is also bumped when the profile's connections,
+    # education, employment, skills, user or image change, see
+    # api/profile_cache.py
+    return Profile.objects.filter(user__username=username)
+
+
+def job_posting_version(request, job_id=None, **kwargs):
+    return JobPosting.objects.filter(id=job_id)
+
+
+def company_version(request, company_id=None, **kwargs):
+    manages = CompanyManager.objects.filter(profile__user=request.user).values_list('company_id', flat=True)
+    return Company.objects.filter(id=company_id, pk__in=manages)
+
+
+def versioned_id(request):
+    """
+    Returns the id of the object a conditional_get view is showing, or None
+    if it does not exist
+    """
+    return request.object_version[0] if request.object_version else None
+
+
+def variant(request):
+    """
+    Returns a short digest of the sorted query parameters and the accepted
+    media type of the request
+    """
+    query = '&'.join('{}={}'.format(key, value) for key, values in sorted(request.GET.lists())
+                     for value in sorted(values))
+    media_type = getattr(request, 'accepted_media_type', '')
+    return md5('{}|{}'.format(query, media_type).encode('utf8')).hexdigest()[:12]
+
+
+def conditional_get(name, version_queryset, volatile=None):
+    """
+    Decorates the get method of a view showing the object returned by
+    version_queryset(request, **kwargs), which must have an `updated` field.
+    name tells apart the representations of the same object. volatile is
+    a (field, function) pair for a part of the representation that changes
+    without `updated` changing, such as a rendered age, which is then put
+    in the ETag as function(field) and Last-Modified is left out.
+    """
+    fields = ['pk', 'updated'] + ([volatile[0]] if volatile else [])
+
+    def version(request, **kwargs):
+        # Looked up once per request for both the ETag and Last-Modified
+        if not hasattr(request, 'object_version'):
+            request.object_version = version_queryset(request, **kwargs).values_list(*fields).first()
+        return request.object_version
+
+    def etag(request, *args, **kwargs):
+        current = version(request, **kwargs)
+        if current is None:
+            return None
+        tag = '{}-{}-{}-{}'.format(name, current[0], current[1].timestamp(), variant(request))
+        if volatile:
+            tag += '-' + md5(str(volatile[1](current[2])).encode('utf8')).hexdigest()[:8]
+        return tag
+
+    def last_modified(request, *args, **kwargs):
+        current = version(request, **kwargs)
+        if current is None or volatile:
+            return None
+        return current[1]
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified))
@@ -0,0 +1,225 @@
+"""
+Server-sent events for new feed posts and job application status changes.
+
+Events are published when a FeedPost is created, to everyone connected to
+its author, and when a JobApplication's status changes, to the applicant.
+Each carries just enough for a client to know what to fetch:
+
+    event: feedpost
+    data: {"id": 12, "user": "matt"}
+
+    event: application
+    data: {"id": 3, "job_posting": 7, "status": "Accepted"}
+
+On PostgreSQL events go through NOTIFY, and a listener thread in every
+process that has subscribers passes them on, so a post made through one
+worker reaches streams held open by another. On other databases, such as
+the tests' SQLite, a LocalBroker passes them between threads of the same
+process instead. Connections made or removed go through the broker as
+well, but only to update which users' posts open streams follow.
+
+The stream is served by EventStream for WSGI, which gives up the worker
+after settings.EVENTS_STREAM_TIMEOUT seconds and lets the browser reconnect,
+and without holding a thread per client by cvconnect_backend/asgi.py.
+"""
+import json
+import select
+from queue import Queue, Empty
+from threading import Lock, Thread
+from time import sleep
+
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_init, post_save
+
+from api.models import Profile, FeedPost, JobApplication
+
+
+Connection = Profile.connections.through
+
+# Tells EventSource how many milliseconds to wait before reconnecting
+RETRY = 'retry: 1000\n\n'
+KEEPALIVE = ': keepalive\n\n'
+
+
+def format_event(event):
+    return 'event: {}\ndata: {}\n\n'.format(event['event'], json.dumps(event['data']))
+
+
+class Subscription(object, ):
+    """
+    A user's interest in events. Events are handed to deliver, which is
+    called from whichever thread published them, or put on a queue for get
+    when no deliver is given.
+    """
+
+    def __init__(self, broker, user_id, following, deliver=None):
+        self.broker = broker
+        self.user_id = user_id
+        self.following = following
+        if deliver is None:
+            self.queue = Queue()
+            deliver = self.queue.put
+        self.deliver = deliver
+
+    def handle(self, event):
+        if event['event'] == 'connection':
+            # Only keeps following current, clients are not told
+            if event['data']['connected']:
+                self.following.add(event['data']['user'])
+            elif event['data']['user'] != self.user_id:
+                self.following.discard(event['data']['user'])
+        else:
+            self.deliver(event)
+
+    def wants(self, event):
+        if event['event'] == 'feedpost':
+            return event['user'] in self.following
+        return event['user'] == self.user_id
+
+    def get(self, timeout):
+        """
+        Returns the next event, or None if there was none within timeout
+        seconds
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker(object, ):
+    """
+    Passes events between the threads of one process
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.subscriptions = set()
+
+    def subscribe(self, user_id, deliver=None):
+        following = set(Connection.objects.filter(from_profile__user_id=user_id)
+                        .values_list('to_profile__user_id', flat=True))
+        following.add(user_id)
+
+        subscription = Subscription(self, user_id, following, deliver)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                subscription.handle(event)
+
+
+class PostgresBroker(LocalBroker, ):
+    """
+    Passes events between processes with PostgreSQL's NOTIFY. The listener
+    thread is started by the first subscription in a process.
+    """
+
+    channel = 'cvconnect_events'
+
+    def __init__(self):
+        super(PostgresBroker, self).__init__()
+        self.listener = None
+
+    def subscribe(self, user_id, deliver=None):
+        with self.lock:
+            if self.listener is None:
+                self.listener = Thread(target=self.listen, name='event-listener')
+                self.listener.daemon = True
+                self.listener.start()
+        return super(PostgresBroker, self).subscribe(user_id, deliver)
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(event)])
+
+    def listen(self):
+        while True:
+            try:
+                listener = connection.get_new_connection(connection.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute('LISTEN {}'.format(self.channel))
+
+                while True:
+                    if select.select([listener], [], [], 60) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        self.dispatch(json.loads(listener.notifies.pop(0).payload))
+            except Exception:
+                # Lost the connection, events published until it is back
+                # are missed
+                sleep(1)
+
+
+broker = None
+
+
+def get_broker():
+    global broker
+    if broker is None:
+        broker = PostgresBroker() if connection.vendor == 'postgresql' else LocalBroker()
+    return broker
+
+
+def publish(event, user_id, data):
+    """
+    Publishes an event about user_id once the current transaction commits
+    """
+    message = {'event': event, 'user': user_id, 'data': data}
+    transaction.on_commit(lambda: get_broker().publish(message))
+
+
+def post_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        publish('feedpost', instance.user_id, {'id': instance.pk, 'user': instance.user.username})
+
+
+def application_loaded(sender, instance, **kwargs):
+    # Read from __dict__ so deferred statuses are not loaded
+    instance._loaded_status = instance.__dict__.get('status', None)
+
+
+def application_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw or instance.status == instance._loaded_status:
+        return
+
+    instance._loaded_status = instance.status
+    user_id = Profile.objects.filter(pk=instance.profile_id).values_list('user_id', flat=True).first()
+    publish('application', user_id, {
+        'id': instance.pk,
+        'job_posting': instance.job_posting_id,
+        'status': instance.status,
+    })
+
+
+def connections_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    connected = action == 'post_add'
+    for user_id in Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+        publish('connection', instance.user_id, {'user': user_id, 'connected': connected})
+        publish('connection', user_id, {'user': instance.user_id, 'connected': connected})
+
+
+post_save.connect(post_saved, sender=FeedPost, dispatch_uid='events-feed-post')
+post_init.connect(application_loaded, sender=JobApplication, dispatch_uid='events-application-loaded')
+post_save.connect(application_saved, sender=JobApplication, dispatch_uid='events-application')
+m2m_changed.connect(connections_changed, sender=Connection, dispatch_uid='events-connections')
@@ -0,0 +1,97 @@
+"""
+The CSV export of the applicants for a job posting.
+
+The applications, the applicants' employment and their skills are each read
+with one query ordered by profile, and the three are walked through
+together, so an export takes four queries, counting the view's lookup of the
+job posting, and constant memory no matter how many applicants there are.
+
+Cells that a spreadsheet would take for a formula are prefixed with a quote
+so that opening an export cannot run one an applicant put in their profile.
+"""
+import csv
+from io import StringIO
+from itertools import groupby, islice
+
+from django.conf import settings
+
+from api.models import JobApplication, EmploymentDescription, Skill
+from api.serializers import current_employment
+
+
+COLUMNS = ['full_name', 'username', 'current_position', 'current_company', 'skills', 'status']
+
+# What spreadsheets start formulas with
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape(value):
+    """
+    Returns value with a quote in front if a spreadsheet would read it as a
+    formula
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class ProfileRows(object, ):
+    """
+    Hands out the rows of each profile from rows ordered by profile id.
+    Profiles must be asked for in ascending order.
+    """
+
+    def __init__(self, rows, key):
+        self.groups = groupby(rows, key)
+        self.profile_id, self.rows = None, []
+
+    def get(self, profile_id):
+        while self.profile_id is None or self.profile_id < profile_id:
+            group = next(self.groups, None)
+            if group is None:
+                return []
+            self.profile_id, self.rows = group[0], list(group[1])
+        return self.rows if self.profile_id == profile_id else []
+
+
+def applicant_rows(job_posting_id):
+    """
+    Yields a row of COLUMNS for each application to the job posting, ordered
+    by applicant
+    """
+    applications = JobApplication.objects.filter(job_posting_id=job_posting_id)
+    applicants = applications.values('profile_id')
+
+    positions = ProfileRows(
+        EmploymentDescription.objects.filter(profile_id__in=applicants).order_by('profile_id', 'start_date')
+        .only('profile_id', 'role', 'employer', 'end_date').iterator(),
+        lambda position: position.profile_id)
+    skills = ProfileRows(
+        Skill.objects.filter(profile_id__in=applicants).order_by('profile_id', 'id')
+        .values_list('profile_id', 'name').iterator(),
+        lambda skill: skill[0])
+
+    for application in applications.select_related('profile__user').order_by('profile_id', 'id').iterator():
+        current_position, current_company = current_employment(positions.get(application.profile_id))
+        yield [
+            application.profile.full_name,
+            application.profile.user.username,
+            current_position,
+            current_company,
+            ', '.join(name for profile_id, name in skills.get(application.profile_id)),
+            application.status,
+        ]
+
+
+def applicants_csv(job_posting_id):
+    """
+    Yields the CSV export of the applicants for the job posting,
+    settings.STREAM_CHUNK_SIZE rows at a time
+    """
+    rows = applicant_rows(job_posting_id)
+    chunk = [COLUMNS]
+    while chunk:
+        out = StringIO()
+        csv.writer(out).writerows([escape(value) for value in row] for row in chunk)
+        yield out.getvalue()
+        chunk = list(islice(rows, settings.STREAM_CHUNK_SIZE))
@@ -0,0 +1,239 @@
+"""
+An in-process copy of the connection graph.
+
+The connections table is loaded into compressed sparse row (CSR) arrays:
+`ids` holds the sorted profile ids that have connections, and the
+neighbours of ids[i] are ids[j] for every j in indices[indptr[i]:indptr[i + 1]].
+Connections made or removed afterwards are recorded in small per-profile
+overlay sets by the m2m_changed handler below, and folded back into the
+arrays once there are enough of them, as each change is committed. Like
+the autocomplete index, each worker rebuilds the graph from the database in
+a background thread once it is older than settings.CONNECTION_GRAPH_MAX_AGE
+seconds, to pick up changes made by other workers, and the old graph is
+read until the new one is swapped in.
+"""
+from array import array
+from bisect import bisect_left
+from threading import RLock, Thread
+from time import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete
+
+from api.models import Profile
+
+
+class ConnectionGraph(object, ):
+
+    # How many overlay edges to allow before folding them into the arrays
+    max_overlay = 10000
+
+    def __init__(self):
+        self.lock = RLock()
+        self.rebuilding = False
+        # Changes committed while a build reads the connections, to apply to
+        # the new graph
+        self.replay = None
+        self.clear()
+
+    def clear(self):
+        self.ids = array('l')
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        self.added = {}
+        self.removed = {}
+        self.overlay = 0
+        self.built = None
+
+    def build(self):
+        """
+        Reads the connections into a new graph and then swaps it in, so the
+        old one can be read until then
+        """
+        Connection = Profile.connections.through
+        edges = Connection.objects.order_by('from_profile_id', 'to_profile_id') \
+            .values_list('from_profile_id', 'to_profile_id')
+
+        with self.lock:
+            self.replay = []
+        fresh = ConnectionGraph()
+        fresh.load(edges.iterator())
+
+        with self.lock:
+            for profile_id, neighbour_ids, connected in self.replay:
+                fresh.patch(profile_id, neighbour_ids, connected)
+            self.replay = None
+            self.ids, self.indptr, self.indices = fresh.ids, fresh.indptr, fresh.indices
+            self.added, self.removed, self.overlay = fresh.added, fresh.removed, fresh.overlay
+            self.built = fresh.built
+
+    def rebuild(self):
+        try:
+            self.build()
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def load(self, edges):
+        """
+        Loads the graph from (profile id, neighbour id) pairs ordered by
+        profile id then neighbour id
+        """
+        self.clear()
+
+        rows = array('l')
+        columns = array('l')
+        for profile_id, neighbour_id in edges:
+            rows.append(profile_id)
+            columns.append(neighbour_id)
+
+        self.ids = array('l', sorted(set(rows) | set(columns)))
+        self.indptr = array('l', [0] * (len(self.ids) + 1))
+        self.indices = array('l', (self.node(neighbour_id) for neighbour_id in columns))
+        for profile_id in rows:
+            self.indptr[self.node(profile_id) + 1] += 1
+        for i in range(len(self.ids)):
+            self.indptr[i + 1] += self.indptr[i]
+
+        self.built = time()
+
+    def ensure_built(self):
+        """
+        Builds the graph if it never has been, or starts rebuilding it in
+        the background if it is too old
+        """
+        if self.built is None:
+            self.build()
+            return
+
+        with self.lock:
+            if self.rebuilding or time() - self.built <= settings.CONNECTION_GRAPH_MAX_AGE:
+                return
+            self.rebuilding = True
+        Thread(target=self.rebuild, daemon=True).start()
+
+    def node(self, profile_id):
+        i = bisect_left(self.ids, profile_id)
+        if i < len(self.ids) and self.ids[i] == profile_id:
+            return i
+        return None
+
+    def neighbours(self, profile_id):
+        i = self.node(profile_id)
+        if i is None:
+            ret = set()
+        else:
+            ret = set(self.ids[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]])
+        ret -= self.removed.get(profile_id, set())
+        ret |= self.added.get(profile_id, set())
+        return ret
+
+    def degree(self, profile_id):
+        """
+        Returns roughly how many connections a profile has without building
+        the set of them. Connections made or removed twice since the arrays
+        were last loaded may be counted twice.
+        """
+        i = self.node(profile_id)
+        ret = 0 if i is None else self.indptr[i + 1] - self.indptr[i]
+        return ret + len(self.added.get(profile_id, ())) - len(self.removed.get(profile_id, ()))
+
+    def _patch(self, profile_id, neighbour_id, connected):
+        add, discard = (self.added, self.removed) if connected else (self.removed, self.added)
+        discard.get(profile_id, set()).discard(neighbour_id)
+        add.setdefault(profile_id, set()).add(neighbour_id)
+        self.overlay += 1
+
+    def patch(self, profile_id, neighbour_ids, connected):
+        """
+        Records that profile_id has been connected to (or disconnected from)
+        each of neighbour_ids, in both directions
+        """
+        with self.lock:
+            if self.replay is not None:
+                self.replay.append((profile_id, list(neighbour_ids), connected))
+            if self.built is None:
+                return
+            for neighbour_id in neighbour_ids:
+                self._patch(profile_id, neighbour_id, connected)
+                self._patch(neighbour_id, profile_id, connected)
+            if self.overlay > self.max_overlay:
+                self.compact()
+
+    def compact(self):
+        built = self.built
+        profile_ids = sorted(set(self.ids) | set(self.added))
+        edges = [(profile_id, neighbour_id)
+                 for profile_id in profile_ids
+                 for neighbour_id in sorted(self.neighbours(profile_id))]
+        self.load(edges)
+        self.built = built
+
+    def mutual(self, first_id, second_id):
+        self.ensure_built()
+        with self.lock:
+            return self.neighbours(first_id) & self.neighbours(second_id)
+
+    def distance(self, first_id, second_id, max_distance=6):
+        """
+        Returns the number of connections on the shortest path between two
+        profiles using a bidirectional breadth first search, or None if they
+        are further than max_distance apart
+        """
+        self.ensure_built()
+        if first_id == second_id:
+            return 0
+
+        with self.lock:
+            seen = [{first_id}, {second_id}]
+            frontiers = [{first_id}, {second_id}]
+            for distance in range(1, max_distance + 1):
+                # Always grow the smaller side
+                side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+                frontier = set()
+                for profile_id in frontiers[side]:
+                    frontier |= self.neighbours(profile_id)
+                frontier -= seen[side]
+
+                if frontier & seen[1 - side]:
+                    return distance
+                if not frontier:
+                    return None
+
+                seen[side] |= frontier
+                frontiers[side] = frontier
+
+            return None
+
+
+graph = ConnectionGraph()
+
+
+def disconnected_all(profile_id):
+    """
+    Patches the graph once the current transaction commits for profile_id
+    having no connections any more
+    """
+    def patch():
+        with graph.lock:
+            graph.patch(profile_id, graph.neighbours(profile_id), False)
+
+    transaction.on_commit(patch)
+
+
+def connections_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        profile_id, neighbour_ids, connected = instance.pk, set(pk_set), action == 'post_add'
+        transaction.on_commit(lambda: graph.patch(profile_id, neighbour_ids, connected))
+    elif action == 'post_clear':
+        disconnected_all(instance.pk)
+
+
+def profile_deleted(sender, instance, **kwargs):
+    disconnected_all(instance.pk)
+
+
+m2m_changed.connect(connections_changed, sender=Profile.connections.through,
+                    dispatch_uid='connection-graph-changed')
+post_delete.connect(profile_deleted, sender=Profile, dispatch_uid='connection-graph-profile-deleted')
@@ -0,0 +1,159 @@
+import json
+from math import ceil
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.models import Profile, JobPosting, JobApplication, EducationDescription, EmploymentDescription, Skill, \
+    Company
+from api.urls import urlpatterns
+
+
+# A GET of every view in api/urls.py that a user can read. {username} is
+# the profile with the most connections and {other} another of the profiles.
+ROUTES = [
+    ('UserList', '/api/users/'),
+    ('UserDetail', '/api/users/{username}/'),
+    ('ProfileList', '/api/profiles/'),
+    ('ProfileDetail', '/api/profiles/{username}/'),
+    ('ProfileFull', '/api/profiles/{username}/full/'),
+    ('ProfileRecommendations', '/api/profiles/{username}/recommendations/'),
+    ('ProfileApplicationIDs', '/api/profiles/{username}/application_ids/'),
+    ('JobPostingList', '/api/jobs/'),
+    ('JobPostingDetail', '/api/jobs/{job}/'),
+    ('JobApplicationList', '/api/jobs/{job}/applications/'),
+    ('JobApplicationDetail', '/api/jobs/{job}/applications/{application}/'),
+    ('Search', '/api/search/an/'),
+    ('Autocomplete', '/api/autocomplete/?q=ma'),
+    ('ProfileImageList', '/api/profiles/{username}/image/'),
+    ('ConnectionList', '/api/profiles/{username}/connections/'),
+    ('MutualConnectionList', '/api/profiles/{username}/mutual/{other}/'),
+    ('ConnectionDistance', '/api/profiles/{username}/distance/{other}/'),
+    ('EducationDescriptionList', '/api/profiles/{username}/education/'),
+    ('EducationDescriptionDetail', '/api/profiles/{username}/education/{education}/'),
+    ('EmploymentDescriptionList', '/api/profiles/{username}/employment/'),
+    ('EmploymentDescriptionDetail', '/api/profiles/{username}/employment/{employment}/'),
+    ('SkillList', '/api/profiles/{username}/skills/'),
+    ('SkillDetail', '/api/profiles/{username}/skills/{skill}/'),
+    ('ProfileApplicationList', '/api/profiles/{username}/applications/'),
+    ('FeedPostList', '/api/profiles/{username}/feedposts/'),
+    ('HomeTimeline', '/api/profiles/{username}/timeline/'),
+    ('UserJobPostingsList', '/api/profiles/{username}/postings/'),
+    ('CompanyList', '/api/companies/'),
+    ('CompanyDetail', '/api/companies/{company}/'),
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(int(ceil(p / 100.0 * len(values))) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = 'Times GETs of every view against the current database, as filled by generate_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='How many times to request each route')
+        parser.add_argument('--output',
+                            help='Write the results to this JSON file, to compare against later')
+        parser.add_argument('--baseline',
+                            help='Compare the results against a JSON file written by --output')
+        parser.add_argument('--route', action='append', default=[],
+                            help='Only benchmark the named view, may be given more than once')
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        params = self.params()
+        client = Client(HTTP_AUTHORIZATION='Token ' + params.pop('token'))
+
+        views = set(pattern.callback.view_class.__name__ for pattern in urlpatterns)
+        skipped = sorted(views - set(view for view, url in ROUTES))
+        if skipped:
+            self.stdout.write('Not benchmarked, as they are only written to or only for staff: {}'.format(', '.join(skipped)))
+
+        results = {}
+        self.stdout.write('{:<28} {:>6} {:>9} {:>9} {:>8} {:>9}'.format(
+            'view', 'status', 'p50 ms', 'p95 ms', 'queries', 'bytes'))
+        # The client's requests are for the host testserver
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for view, url in ROUTES:
+                if options['route'] and view not in options['route']:
+                    continue
+                results[view] = self.measure(client, url.format(**params), options['repeat'])
+                self.stdout.write(self.format_row(view, results[view], baseline.get(view, None)))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    def params(self):
+        """
+        Picks the objects to request, preferring the biggest ones
+        """
+        profile = Profile.objects.annotate(degree=Count('connections')).order_by('-degree', 'id') \
+            .select_related('user').first()
+        if profile is None:
+            raise CommandError('The database is empty, fill it with `python manage.py generate_data` first')
+
+        other = Profile.objects.exclude(pk=profile.pk).select_related('user').order_by('id').first() or profile
+        job = JobPosting.objects.annotate(applicants=Count('jobapplication')).order_by('-applicants', 'id').first()
+        application = JobApplication.objects.filter(job_posting=job).first() if job else None
+        first_id = lambda model: getattr(model.objects.filter(profile=profile).first(), 'pk', 0)
+        company = Company.objects.filter(companymanager__profile=profile).first() or Company.objects.first()
+
+        return {
+            'token': Token.objects.get_or_create(user=profile.user)[0].key,
+            'username': profile.user.username,
+            'other': other.user.username,
+            'job': job.pk if job else 0,
+            'application': application.pk if application else 0,
+            'education': first_id(EducationDescription),
+            'employment': first_id(EmploymentDescription),
+            'skill': first_id(Skill),
+            'company': company.pk if company else 0,
+        }
+
+    def measure(self, client, url, repeat):
+        """
+        Requests url repeat times after one untimed request, which fills
+        the caches the view reads through
+        """
+        client.get(url)
+
+        times, queries = [], []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = perf_counter()
+                response = client.get(url)
+                content = b''.join(response) if response.streaming else response.content
+                times.append((perf_counter() - start) * 1000)
+            queries.append(len(captured))
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50': round(percentile(times, 50), 2),
+            'p95': round(percentile(times, 95), 2),
+            'queries': max(queries),
+            'bytes': len(content),
+        }
+
+    def format_row(self, view, result, baseline):
+        row = '{:<28} {:>6} {:>9.2f} {:>9.2f} {:>8} {:>9}'.format(
+            view, result['status'], result['p50'], result['p95'], result['queries'], result['bytes'])
+        if baseline is None:
+            return row
+
+        change = (result['p50'] - baseline['p50']) / baseline['p50'] * 100 if baseline['p50'] else 0
+        return '{}   p50 {:+.0f}% queries {:+d} bytes {:+d}'.format(
+            row, change, result['queries'] - baseline['queries'], result['bytes'] - baseline['bytes'])
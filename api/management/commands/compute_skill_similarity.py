@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import SimilarProfile
+from api.similarity import skill_matrix, top_similar
+
+
+class Command(BaseCommand):
+    help = 'Computes the most similar profiles to each profile by their skills, ' \
+           'for the skills mode of profile recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20,
+                            help='How many similar profiles to store for each profile')
+        parser.add_argument('--batch-size', type=int, default=256,
+                            help='How many profiles to compare against every other profile at once')
+
+    def handle(self, *args, **options):
+        matrix, profile_ids = skill_matrix()
+
+        similar = [
+            SimilarProfile(profile_id=profile_id, similar_id=similar_id, score=score)
+            for profile_id, similar_id, score in top_similar(matrix, profile_ids, options['top_k'],
+                                                             options['batch_size'])
+        ]
+
+        with transaction.atomic():
+            SimilarProfile.objects.all().delete()
+            SimilarProfile.objects.bulk_create(similar, batch_size=1000)
+
+        self.stdout.write('Stored {} similar profiles for {} profiles'.format(len(similar), len(profile_ids)))
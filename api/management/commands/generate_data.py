@@ -0,0 +1,217 @@
+from collections import Counter
+from datetime import date
+from random import Random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Profile, Skill, EducationDescription, EmploymentDescription, JobPosting, JobApplication, \
+    Company, CompanyManager, FeedPost, TimelineEntry
+from api.search import rebuild_index
+
+
+FIRST_NAMES = ['Matt', 'Jane', 'Alex', 'Sam', 'Priya', 'Wei', 'Olivia', 'Noah', 'Fatima', 'Liam', 'Chloe', 'Arjun',
+               'Mia', 'Lucas', 'Aisha', 'Jack', 'Zoe', 'Ethan', 'Hana', 'Oscar']
+LAST_NAMES = ['Smith', 'Nguyen', 'Chen', 'Patel', 'Brown', 'Wilson', 'Singh', 'Taylor', 'Kim', 'Martin', 'Lee',
+              'Walker', 'Khan', 'White', 'Harris', 'Clarke', 'Young', 'King', 'Wright', 'Scott']
+COUNTRIES = ['Australia', 'New Zealand', 'United States', 'United Kingdom', 'India', 'China', 'Canada', 'Germany']
+SKILLS = ['Python', 'Django', 'JavaScript', 'React', 'SQL', 'PostgreSQL', 'Java', 'C', 'C++', 'Go', 'Rust', 'Docker',
+          'AWS', 'Linux', 'Git', 'HTML', 'CSS', 'Communication', 'Leadership', 'Machine Learning', 'Statistics',
+          'Excel', 'Project Management', 'Agile', 'Testing', 'Security', 'Networking', 'Design', 'Marketing',
+          'Sales']
+INSTITUTIONS = ['UNSW', 'University of Sydney', 'UTS', 'Macquarie University', 'University of Melbourne', 'Monash',
+                'ANU', 'University of Queensland']
+DEGREES = ['Bachelor of Engineering', 'Bachelor of Science', 'Bachelor of Commerce', 'Master of IT', 'PhD']
+EMPLOYERS = ['Nozama', 'Elgoog', 'Hardsoft', 'Koobecaf', 'Atlassian', 'Canva', 'Telstra', 'Westpac', 'Optus', 'CBA']
+ROLES = ['Developer', 'Senior Developer', 'Data Scientist', 'Designer', 'Product Manager', 'Engineering Manager',
+         'Analyst', 'Consultant', 'Intern']
+CITIES = ['Sydney', 'Melbourne', 'Brisbane', 'Perth', 'Adelaide', 'Canberra']
+WORDS = ['just', 'shipped', 'a', 'new', 'feature', 'looking', 'for', 'great', 'people', 'to', 'join', 'our', 'team',
+         'excited', 'about', 'the', 'conference', 'next', 'week', 'hiring', 'remote', 'engineers', 'today']
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with a reproducible synthetic dataset for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='How many users to create, everything else is scaled from this')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the random generator, the same seed gives the same dataset')
+        parser.add_argument('--prefix', default='user',
+                            help='Prefix for the generated usernames')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='How many rows to insert per query, as many as the database allows by default')
+
+    def handle(self, *args, **options):
+        self.rng = Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = prefix = options['prefix']
+        count = options['users']
+
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError('There are already users named {}*, pick another --prefix'.format(prefix))
+
+        with transaction.atomic():
+            profiles = self.create_profiles(prefix, count)
+            connections = self.create_connections(profiles)
+            self.create_cvs(profiles)
+            jobs = self.create_jobs(profiles, max(count // 10, 1))
+            self.create_applications(profiles, jobs)
+            self.create_companies(profiles, max(count // 20, 1))
+            posts = self.create_posts(profiles, connections)
+            rebuild_index()
+
+        self.stdout.write('Created {} users with {} connections, {} job postings and {} feed posts. '
+                          'Every password is "password".'.format(count, len(connections) // 2, len(jobs), posts))
+
+    def skewed(self, items):
+        """
+        Picks from items, favouring the ones near the start
+        """
+        return items[int(len(items) * self.rng.random() ** 2)]
+
+    def some_date(self, start_year=2000):
+        return date(self.rng.randint(start_year, 2016), self.rng.randint(1, 12), 1)
+
+    def create_profiles(self, prefix, count):
+        password = make_password('password')
+        usernames = ['{}{}'.format(prefix, i) for i in range(count)]
+        User.objects.bulk_create([
+            User(username=username, email='{}@example.com'.format(username), password=password)
+            for username in usernames
+        ], batch_size=self.batch_size)
+        users = User.objects.filter(username__startswith=prefix).order_by('id')
+
+        profiles = []
+        for user in users:
+            full_name = '{} {}'.format(self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES))
+            profiles.append(Profile(user=user, full_name=full_name, preferred_name=full_name.split()[0],
+                                    country=self.skewed(COUNTRIES)))
+        Profile.objects.bulk_create(profiles, batch_size=self.batch_size)
+        return list(Profile.objects.filter(user__in=users).order_by('id').values_list('pk', 'user_id'))
+
+    def create_connections(self, profiles):
+        """
+        Connects profiles by preferential attachment, each new profile
+        connecting to a few earlier ones picked in proportion to how many
+        connections they have. A few profiles end up with very many
+        connections and most with only a handful, as in real networks.
+        """
+        ids = [profile_id for profile_id, user_id in profiles]
+        edges = set()
+        # Every profile appears once per connection, plus once so new ones
+        # can be picked
+        targets = []
+        for i, profile_id in enumerate(ids):
+            for _ in range(min(self.rng.randint(1, 9), i)):
+                other = self.rng.choice(targets)
+                if other != profile_id and (profile_id, other) not in edges:
+                    edges.add((profile_id, other))
+                    edges.add((other, profile_id))
+                    targets.extend([profile_id, other])
+            targets.append(profile_id)
+
+        Connection = Profile.connections.through
+        Connection.objects.bulk_create([Connection(from_profile_id=first, to_profile_id=second)
+                                        for first, second in sorted(edges)], batch_size=self.batch_size)
+
+        # As api/timeline.py keeps them
+        by_count = {}
+        for profile_id, count in Counter(first for first, second in edges).items():
+            by_count.setdefault(count, []).append(profile_id)
+        for count, profile_ids in by_count.items():
+            # SQLite allows at most 999 parameters
+            for start in range(0, len(profile_ids), 500):
+                Profile.objects.filter(pk__in=profile_ids[start:start + 500]).update(connection_count=count)
+        return edges
+
+    def create_cvs(self, profiles):
+        skills, education, employment = [], [], []
+        for profile_id, user_id in profiles:
+            for name in self.rng.sample(SKILLS, self.rng.randint(0, 10)):
+                skills.append(Skill(profile_id=profile_id, name=name, proficiency=self.rng.randint(1, 5)))
+
+            for _ in range(self.rng.randint(1, 3)):
+                started = self.some_date()
+                education.append(EducationDescription(
+                    profile_id=profile_id, institution=self.skewed(INSTITUTIONS), degree=self.rng.choice(DEGREES),
+                    date_started=started, date_attained=date(min(started.year + 3, 2016), 12, 1)))
+
+            jobs = self.rng.randint(1, 4)
+            for i in range(jobs):
+                current = i == jobs - 1 and self.rng.random() < 0.7
+                employment.append(EmploymentDescription(
+                    profile_id=profile_id, location=self.rng.choice(CITIES), employer=self.skewed(EMPLOYERS),
+                    role=self.rng.choice(ROLES), start_date=self.some_date(2005),
+                    end_date=None if current else self.some_date(2010)))
+
+        Skill.objects.bulk_create(skills, batch_size=self.batch_size)
+        EducationDescription.objects.bulk_create(education, batch_size=self.batch_size)
+        EmploymentDescription.objects.bulk_create(employment, batch_size=self.batch_size)
+
+    def create_jobs(self, profiles, count):
+        recruiters = [user_id for profile_id, user_id in self.rng.sample(profiles, min(count, len(profiles)))]
+        JobPosting.objects.bulk_create([
+            JobPosting(recruiter_id=self.rng.choice(recruiters), company=self.skewed(EMPLOYERS),
+                       position=self.rng.choice(ROLES), description='A great job', compensation='Competitive')
+            for _ in range(count)
+        ], batch_size=self.batch_size)
+        return list(JobPosting.objects.filter(recruiter__username__startswith=self.prefix).order_by('-id')
+                    .values_list('pk', flat=True)[:count])
+
+    def create_applications(self, profiles, jobs):
+        applications = []
+        for profile_id, user_id in profiles:
+            for job_id in set(self.skewed(jobs) for _ in range(self.rng.randint(0, 5))):
+                applications.append(JobApplication(job_posting_id=job_id, profile_id=profile_id,
+                                                   status=self.skewed(['Pending', 'Accepted', 'Rejected'])))
+        JobApplication.objects.bulk_create(applications, batch_size=self.batch_size)
+
+    def create_companies(self, profiles, count):
+        names = ['{} {}'.format(self.rng.choice(EMPLOYERS), i) for i in range(count)]
+        Company.objects.bulk_create([
+            Company(name=name, description='A company',
+                    industry=self.rng.choice(['Technology', 'Finance', 'Retail', 'Telecommunications']))
+            for name in names
+        ], batch_size=self.batch_size)
+
+        # The earliest profiles have the most connections, and manage the
+        # most companies
+        companies = Company.objects.order_by('-id').values_list('pk', flat=True)[:count]
+        CompanyManager.objects.bulk_create([CompanyManager(profile_id=self.skewed(profiles)[0], company_id=company_id)
+                                            for company_id in companies], batch_size=self.batch_size)
+
+    def create_posts(self, profiles, connections):
+        """
+        Creates feed posts and writes them onto home timelines the way
+        api/timeline.py does
+        """
+        user_ids = [user_id for profile_id, user_id in profiles]
+        FeedPost.objects.bulk_create([
+            FeedPost(user_id=user_id, text=' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(3, 20))))
+            for user_id in user_ids for _ in range(int(10 * self.rng.random() ** 2))
+        ], batch_size=self.batch_size)
+
+        user_of = dict(profiles)
+        followers = {}
+        for first, second in connections:
+            followers.setdefault(user_of[first], []).append(user_of[second])
+
+        entries = []
+        posts = FeedPost.objects.filter(user__username__startswith=self.prefix).values_list('pk', 'user_id', 'created')
+        for post_id, user_id, created in posts.iterator():
+            readers = followers.get(user_id, [])
+            if len(readers) > settings.TIMELINE_FANOUT_LIMIT:
+                readers = []
+            for reader in [user_id] + readers:
+                entries.append(TimelineEntry(user_id=reader, post_id=post_id, created=created))
+            if len(entries) >= 10000:
+                TimelineEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+                entries = []
+        TimelineEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+
+        return posts.count()
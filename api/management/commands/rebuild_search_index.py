@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.models import SearchEntry
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search index from the profiles, job postings and skills in the database'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write('Indexed {} search entries'.format(SearchEntry.objects.count()))
@@ -0,0 +1,55 @@
+import json
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import capture_path
+
+
+class Command(BaseCommand):
+    help = 'Lists the requests captured by ProfilingMiddleware, or summarizes one of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture_id', nargs='?',
+                            help='The capture to summarize, all captures are listed if left out')
+        parser.add_argument('--sort', default='cumulative',
+                            help='How to sort the functions, any of the keys pstats accepts')
+        parser.add_argument('--limit', type=int, default=25,
+                            help='How many functions to show')
+
+    def handle(self, *args, **options):
+        if options['capture_id']:
+            self.summarize(options['capture_id'], options['sort'], options['limit'])
+        else:
+            self.list()
+
+    def list(self):
+        if not os.path.isdir(settings.PROFILING_DIR):
+            return
+
+        names = sorted((name for name in os.listdir(settings.PROFILING_DIR) if name.endswith('.json')), reverse=True)
+        for name in names:
+            with open(os.path.join(settings.PROFILING_DIR, name)) as f:
+                capture = json.load(f)
+            self.stdout.write('{id}  {status}  {duration_ms:>9.1f} ms  {count:>4} queries  {method} {path}'.format(
+                count=len(capture['queries']), **capture))
+
+    def summarize(self, capture_id, sort, limit):
+        try:
+            with open(capture_path(capture_id, 'json')) as f:
+                capture = json.load(f)
+        except IOError:
+            raise CommandError('There is no capture {}'.format(capture_id))
+
+        self.stdout.write('{method} {path} ({view}) returned {status} in {duration_ms:.1f} ms'.format(**capture))
+        self.stdout.write('')
+
+        stats = pstats.Stats(capture_path(capture_id, 'pstats'), stream=self.stdout)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+
+        self.stdout.write('{} queries taking {:.1f} ms:'.format(
+            len(capture['queries']), sum(query['duration_ms'] for query in capture['queries'])))
+        for query in capture['queries']:
+            self.stdout.write('{start_ms:>9.1f} ms  +{duration_ms:<8.1f} {sql}'.format(**query))
@@ -0,0 +1,28 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import send_queued
+
+
+class Command(BaseCommand):
+    help = 'Sends the emails waiting in the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='How many emails to send over each connection to the mail server')
+        parser.add_argument('--loop', action='store_true', default=False,
+                            help='Keep running and poll the outbox for new emails')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait between polls when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued(options['batch_size'])
+            if sent or failed:
+                self.stdout.write('Sent {} emails, {} failed'.format(sent, failed))
+
+            if not options['loop']:
+                break
+            if sent + failed < options['batch_size']:
+                sleep(options['interval'])
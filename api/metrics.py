@@ -0,0 +1,110 @@
+"""
+Prometheus metrics, served in the text format at /api/metrics/.
+
+MetricsMiddleware records each request's latency, database time and
+response size by view, serializers that mix in TimedSerializerMixin record
+how long they take, and the profile cache records its hits and misses.
+Under gunicorn every worker keeps its metrics in memory mapped files in the
+prometheus_multiproc_dir directory (see cvconnect_backend/gunicorn.py),
+which are added up across workers whenever the metrics are scraped. Without
+that environment variable the metrics of the one process are served. Only
+staff users can read them.
+"""
+import os
+from time import perf_counter
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from rest_framework import serializers
+
+
+# Response sizes in bytes, from 100B to 10MB
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+request_duration = Histogram('cvconnect_request_duration_seconds', 'Time taken to respond to requests',
+                             ['view', 'method'])
+db_duration = Histogram('cvconnect_request_db_duration_seconds', 'Time spent running SQL queries per request',
+                        ['view'])
+response_size = Histogram('cvconnect_response_size_bytes', 'Size of response bodies, not counting streamed ones',
+                          ['view'], buckets=SIZE_BUCKETS)
+responses = Counter('cvconnect_responses_total', 'Responses sent', ['view', 'status'])
+serializer_duration = Histogram('cvconnect_serializer_duration_seconds', 'Time taken to serialize data',
+                                ['serializer'])
+cache_requests = Counter('cvconnect_cache_requests_total', 'Cache lookups by whether they were found',
+                         ['cache', 'result'])
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class MetricsMiddleware(object, ):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        response = self.get_response(request)
+        duration = perf_counter() - start
+
+        view = view_name(request)
+        request_duration.labels(view, request.method).observe(duration)
+        responses.labels(view, str(response.status_code)).inc()
+        if hasattr(request, 'query_time'):
+            db_duration.labels(view).observe(request.query_time)
+        if not response.streaming:
+            response_size.labels(view).observe(len(response.content))
+
+        return response
+
+
+class TimedSerializerMixin(object, ):
+    """
+    Records how long a serializer takes to produce its data in
+    serializer_duration, labelled with its class name, or its child's
+    followed by [] for a list. Lists use TimedListSerializer unless the
+    serializer's Meta names a list serializer, which should then be a
+    TimedListSerializer too.
+    """
+
+    @property
+    def data(self):
+        if hasattr(self, '_data'):
+            return super(TimedSerializerMixin, self).data
+
+        start = perf_counter()
+        try:
+            return super(TimedSerializerMixin, self).data
+        finally:
+            name = type(self.child).__name__ + '[]' if isinstance(self, serializers.ListSerializer) \
+                else type(self).__name__
+            serializer_duration.labels(name).observe(perf_counter() - start)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if hasattr(getattr(cls, 'Meta', None), 'list_serializer_class'):
+            return super(TimedSerializerMixin, cls).many_init(*args, **kwargs)
+
+        list_kwargs = dict((key, value) for key, value in kwargs.items()
+                           if key in serializers.LIST_SERIALIZER_KWARGS)
+        kwargs.pop('allow_empty', None)
+        list_kwargs['child'] = cls(*args, **kwargs)
+        return TimedListSerializer(*args, **list_kwargs)
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer, ):
+    pass
+
+
+def latest():
+    """
+    Returns the current metrics in the Prometheus text format, added up
+    across processes when there are several
+    """
+    if 'prometheus_multiproc_dir' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,96 @@
+import json
+import logging
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+
+
+logger = logging.getLogger('api.queries')
+
+
+class CountingCursorWrapper(CursorWrapper, ):
+    """
+    Counts the queries run through a cursor and the time they take, without
+    keeping their SQL as the debug cursor does
+    """
+
+    def __init__(self, cursor, db, counts):
+        super(CountingCursorWrapper, self).__init__(cursor, db)
+        self.counts = counts
+
+    def count(self, method, *args):
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.counts[0] += 1
+            self.counts[1] += perf_counter() - start
+
+    def execute(self, sql, params=None):
+        return self.count(super(CountingCursorWrapper, self).execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self.count(super(CountingCursorWrapper, self).executemany, sql, param_list)
+
+
+class QueryCountMiddleware(object, ):
+    """
+    Counts the SQL queries each request runs and the time spent in them.
+    With settings.QUERY_COUNT_HEADERS on (the default when DEBUG is) they
+    are returned in the X-Query-Count and X-Query-Time headers, otherwise
+    they are logged as a line of JSON to the api.queries logger. They are
+    also left on the request as query_count and query_time (in seconds).
+
+    With the headers on queries are read back from the debug cursor's log,
+    otherwise a CountingCursorWrapper counts them without storing their SQL.
+    Queries run while a streamed response is being sent, after the headers
+    have gone, are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        debug = settings.QUERY_COUNT_HEADERS or settings.DEBUG
+        counts = [0, 0.0]
+        logged = {}
+        for connection in connections.all():
+            logged[connection.alias] = (connection.force_debug_cursor, len(connection.queries_log))
+            if debug:
+                connection.force_debug_cursor = True
+            else:
+                connection.make_cursor = \
+                    lambda cursor, connection=connection: CountingCursorWrapper(cursor, connection, counts)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            count, time = counts
+            for connection in connections.all():
+                force_debug_cursor, start = logged.get(connection.alias, (False, 0))
+                connection.force_debug_cursor = force_debug_cursor
+                connection.__dict__.pop('make_cursor', None)
+                # Queries that went through a debug cursor anyway, e.g. while
+                # the request was profiled
+                queries = list(connection.queries_log)[start:]
+                count += len(queries)
+                time += sum(float(query['time']) for query in queries)
+            request.query_count, request.query_time = count, time
+
+        if settings.QUERY_COUNT_HEADERS:
+            response['X-Query-Count'] = str(count)
+            response['X-Query-Time'] = '{:.1f}'.format(time * 1000)
+        else:
+            match = getattr(request, 'resolver_match', None)
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'queries': count,
+                'db_time_ms': round(time * 1000, 1),
+            }))
+
+        return response
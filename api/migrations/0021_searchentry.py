@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 17:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_trigram_index(apps, schema_editor):
+    # Only PostgreSQL can index substring searches, other databases scan
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX api_searchentry_text_trgm ON api_searchentry USING gin (UPPER(text) gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS api_searchentry_text_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_feedpost_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subtype', models.CharField(choices=[('profiles', 'profiles'), ('jobs', 'jobs'), ('skills', 'skills'), ('locations', 'locations')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('username', models.CharField(blank=True, default='', max_length=150)),
+                ('text', models.TextField(blank=True, default='')),
+                ('visible_id', models.TextField(blank=True, default='')),
+                ('match', models.TextField(blank=True, default='')),
+                ('image', models.TextField(blank=True, null=True)),
+                ('profile', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.Profile')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchentry',
+            unique_together=set([('subtype', 'object_id')]),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 17:42
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_searchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_profiles', to='api.Profile')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.Profile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 17:45
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profileimage',
+            name='thumbnail_128',
+            field=models.ImageField(blank=True, null=True, upload_to='profile-images/thumbnails'),
+        ),
+        migrations.AddField(
+            model_name='profileimage',
+            name='thumbnail_512',
+            field=models.ImageField(blank=True, null=True, upload_to='profile-images/thumbnails'),
+        ),
+        migrations.AddField(
+            model_name='profileimage',
+            name='thumbnail_64',
+            field=models.ImageField(blank=True, null=True, upload_to='profile-images/thumbnails'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 17:55
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0026_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='forgottenpasswordtoken',
+            name='token',
+            field=models.UUIDField(unique=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='employmentdescription',
+            index_together=set([('profile', 'end_date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='feedpost',
+            index_together=set([('user', 'created', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='jobapplication',
+            index_together=set([('job_posting', 'status')]),
+        ),
+    ]
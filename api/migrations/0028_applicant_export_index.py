@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 18:14
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='jobapplication',
+            index_together=set([('job_posting', 'status'), ('job_posting', 'profile')]),
+        ),
+    ]
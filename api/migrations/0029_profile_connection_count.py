@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 18:49
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_connections(apps, schema_editor):
+    Profile = apps.get_model('api', 'Profile')
+    counts = Profile.connections.through.objects.values('from_profile_id').annotate(count=Count('id'))
+    for row in list(counts):
+        Profile.objects.filter(pk=row['from_profile_id']).update(connection_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_applicant_export_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='connection_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_connections, migrations.RunPython.noop),
+    ]
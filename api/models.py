@@ -1,9 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator
+from django.utils import timezone
 
 class ProfileImage(models.Model, ):
     image = models.ImageField(upload_to='profile-images')
+    thumbnail_64 = models.ImageField(upload_to='profile-images/thumbnails', blank=True, null=True)
+    thumbnail_128 = models.ImageField(upload_to='profile-images/thumbnails', blank=True, null=True)
+    thumbnail_512 = models.ImageField(upload_to='profile-images/thumbnails', blank=True, null=True)
 
 
 class Profile(models.Model, ):
@@ -19,6 +23,10 @@ class Profile(models.Model, ):
     country = models.CharField(max_length=100, blank=False, null=False)
     connections = models.ManyToManyField('self', blank=True)
     image = models.ForeignKey(ProfileImage, blank=True, null=True)
+    updated = models.DateTimeField(blank=False, null=False, auto_now=True)
+    # How many connections the profile has, kept by api/timeline.py to tell
+    # which authors' posts are not fanned out
+    connection_count = models.PositiveIntegerField(default=0)
 
     def skills(self):
         return Skill.objects.filter(profile=self)
@@ -40,6 +48,7 @@ class JobPosting(models.Model, ):
     compensation = models.TextField(blank=True, null=False, default='')
     position = models.TextField(blank=True, null=False, default='')
     created = models.DateTimeField(blank=False, null=False, auto_now=True)
+    updated = models.DateTimeField(blank=False, null=False, auto_now=True)
 
 
 class JobApplication(models.Model, ):
@@ -56,6 +65,9 @@ class JobApplication(models.Model, ):
     status = models.CharField(choices=STATUS_CHOICES, max_length=10,
                               blank=False, null=False, default='Pending')
 
+    class Meta:
+        index_together = [('job_posting', 'status'), ('job_posting', 'profile')]
+
 
 class EducationDescription(models.Model, ):
     """
@@ -71,6 +83,7 @@ class EducationDescription(models.Model, ):
     field_of_study = models.TextField(default='', blank=True, null=True)
     extra_activities = models.TextField(default='', blank=True, null=True)
     description = models.TextField(default='', blank=True, null=True)
+    updated = models.DateTimeField(blank=False, null=False, auto_now=True)
 
 
 class EmploymentDescription(models.Model, ):
@@ -85,6 +98,10 @@ class EmploymentDescription(models.Model, ):
     start_date = models.DateField(blank=False, null=False)
     end_date = models.DateField(blank=True, null=True)
     achievements = models.TextField(default='', blank=True, null=False)
+    updated = models.DateTimeField(blank=False, null=False, auto_now=True)
+
+    class Meta:
+        index_together = [('profile', 'end_date')]
 
 
 class Skill(models.Model, ):
@@ -95,6 +112,7 @@ class Skill(models.Model, ):
     profile = models.ForeignKey(Profile)
     name = models.CharField(max_length=100, blank=False, null=False)
     proficiency = models.PositiveIntegerField(validators=[MaxValueValidator(5),])
+    updated = models.DateTimeField(blank=False, null=False, auto_now=True)
 
 
 class Company(models.Model, ):
@@ -107,6 +125,7 @@ class Company(models.Model, ):
     description = models.TextField(blank=False, null=False)
     industry = models.CharField(max_length=100, blank=False, null=False)
     home_page = models.URLField(blank=True, null=True)
+    updated = models.DateTimeField(blank=False, null=False, auto_now=True)
 
     def social_links(self):
         return SocialLink.objects.filter(company=self)
@@ -142,7 +161,7 @@ class ForgottenPasswordToken(models.Model, ):
     A token for a forgotten password
     """
     user = models.ForeignKey(User)
-    token = models.UUIDField(blank=False, null=False)
+    token = models.UUIDField(blank=False, null=False, unique=True)
 
 
 class FeedPost(models.Model, ):
@@ -151,4 +170,74 @@ class FeedPost(models.Model, ):
     """
     user = models.ForeignKey(User)
     text = models.TextField(blank=False, null=False)
-    created = models.DateTimeField(blank=False, null=False, auto_now=True)
\ No newline at end of file
+    created = models.DateTimeField(blank=False, null=False, auto_now=True)
+
+    class Meta:
+        index_together = [('user', 'created', 'id')]
+
+
+class SearchEntry(models.Model, ):
+    """
+    A row of the search index. Every profile, job posting, skill and
+    location has an entry, kept up to date by the signal handlers in
+    api/search.py
+    """
+
+    SUBTYPE_CHOICES = [('profiles', 'profiles'),
+                       ('jobs', 'jobs'),
+                       ('skills', 'skills'),
+                       ('locations', 'locations')]
+
+    subtype = models.CharField(choices=SUBTYPE_CHOICES, max_length=10, blank=False, null=False)
+    object_id = models.PositiveIntegerField(blank=False, null=False)
+    profile = models.ForeignKey(Profile, blank=True, null=True)
+    username = models.CharField(max_length=150, blank=True, null=False, default='')
+    text = models.TextField(blank=True, null=False, default='')
+    visible_id = models.TextField(blank=True, null=False, default='')
+    match = models.TextField(blank=True, null=False, default='')
+    image = models.TextField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('subtype', 'object_id')
+
+
+class SimilarProfile(models.Model, ):
+    """
+    A profile whose skills are similar to another's, with their cosine
+    similarity, as computed by the compute_skill_similarity command
+    """
+
+    profile = models.ForeignKey(Profile, related_name='similar_profiles')
+    similar = models.ForeignKey(Profile, related_name='+')
+    score = models.FloatField(blank=False, null=False)
+
+
+class OutboxEmail(models.Model, ):
+    """
+    An email waiting to be sent by the send_queued_mail worker, so requests
+    never wait on the mail server
+    """
+
+    subject = models.TextField(blank=False, null=False)
+    body = models.TextField(blank=False, null=False)
+    from_email = models.CharField(max_length=254, blank=False, null=False)
+    to = models.TextField(blank=False, null=False)
+    created = models.DateTimeField(blank=False, null=False, auto_now_add=True)
+    next_attempt = models.DateTimeField(blank=False, null=False, default=timezone.now, db_index=True)
+    attempts = models.PositiveIntegerField(blank=False, null=False, default=0)
+    last_error = models.TextField(blank=True, null=False, default='')
+    sent = models.DateTimeField(blank=True, null=True, db_index=True)
+
+
+class TimelineEntry(models.Model, ):
+    """
+    A feed post on a user's home timeline, written when the post is created
+    for the author and each of their connections
+    """
+
+    user = models.ForeignKey(User)
+    post = models.ForeignKey(FeedPost)
+    created = models.DateTimeField(blank=False, null=False)
+
+    class Meta:
+        index_together = [('user', 'created', 'post')]
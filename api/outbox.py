@@ -0,0 +1,98 @@
+"""
+A persistent outbox for email.
+
+Views call queue_mail instead of send_mail, which only inserts a row, and
+the send_queued_mail worker (see the Procfile) delivers the queued emails in
+batches over a single SMTP connection. Failed emails are retried with
+exponential backoff until settings.OUTBOX_MAX_ATTEMPTS is reached.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import OutboxEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Queues an email for the worker to send, taking the same arguments as
+    django.core.mail.send_mail
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        to=','.join(recipient_list),
+    )
+
+
+def queue_mass_mail(datatuple):
+    """
+    Queues many emails in one insert, taking the same argument as
+    django.core.mail.send_mass_mail
+    """
+    return OutboxEmail.objects.bulk_create([
+        OutboxEmail(subject=subject, body=message, from_email=from_email, to=','.join(recipient_list))
+        for subject, message, from_email, recipient_list in datatuple
+    ])
+
+
+def backoff(attempts):
+    return timedelta(seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def send_queued(batch_size):
+    """
+    Sends up to batch_size queued emails that are due over one connection to
+    the mail server. Returns how many were sent and how many failed.
+    """
+    sent = failed = 0
+
+    with transaction.atomic():
+        # Rows being sent by another worker are locked, skip past them
+        emails = list(OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+            sent__isnull=True,
+            next_attempt__lte=timezone.now(),
+            attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+        ).order_by('next_attempt', 'id')[:batch_size])
+
+        if not emails:
+            return sent, failed
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            error = 'Could not connect to the mail server: {}'.format(e)
+            for email in emails:
+                fail(email, error)
+            return sent, len(emails)
+
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, email.from_email, email.to.split(','),
+                                       connection=connection)
+                try:
+                    message.send()
+                except Exception as e:
+                    fail(email, str(e))
+                    failed += 1
+                else:
+                    email.sent = timezone.now()
+                    email.attempts += 1
+                    email.save(update_fields=['sent', 'attempts'])
+                    sent += 1
+        finally:
+            connection.close()
+
+    return sent, failed
+
+
+def fail(email, error):
+    email.attempts += 1
+    email.last_error = error
+    email.next_attempt = timezone.now() + backoff(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'next_attempt'])
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination, Cursor, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination, ):
+    """
+    Opaque cursor pagination over an indexed column, so fetching any page
+    costs the same as fetching the first one.
+
+    Views may set an `ordering` attribute to page by something other than
+    newest first. Clients may request a smaller page with ?page_size=, which
+    is capped at settings.MAX_PAGE_SIZE.
+    """
+
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'ordering', self.ordering)
+        return super(KeysetPagination, self).get_ordering(request, queryset, view)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=settings.MAX_PAGE_SIZE
+            )
+        except (KeyError, ValueError):
+            return min(self.page_size, settings.MAX_PAGE_SIZE)
+
+
+def seek(queryset, position, id_field='id'):
+    """
+    Filters queryset down to the rows after position, a (created, id) pair,
+    when ordered newest first
+    """
+    if position is None:
+        return queryset
+    created, pk = position
+    return queryset.filter(Q(created__lt=created) | Q(**{'created': created, id_field + '__lt': pk}))
+
+
+class SeekPagination(KeysetPagination, ):
+    """
+    Cursor pagination newest first on (created, id), for rows whose created
+    timestamps are not unique. The cursor holds the position of the last row
+    on the page so the next page is one range read on a (created, id) index.
+    Only next links are given.
+
+    paginate_queryset takes a queryset, views that merge several sources
+    call paginate with a function returning up to count rows after a
+    position instead.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate(
+            lambda position, count: seek(queryset, position).order_by('-created', '-id')[:count],
+            request,
+        )
+
+    def paginate(self, fetch, request, key=lambda row: (row.created, row.pk)):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        cursor = self.decode_cursor(request)
+        position = self.decode_position(cursor.position) if cursor else None
+
+        rows = list(fetch(position, self.page_size + 1))
+        self.next_position = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_position = key(rows[-1])
+        return rows
+
+    def decode_position(self, position):
+        try:
+            created, pk = position.rsplit('|', 1)
+            created = parse_datetime(created)
+            if created is None:
+                raise ValueError
+            return created, int(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        created, pk = self.next_position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position='{}|{}'.format(created.isoformat(), pk)))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
+class RankedPagination(LimitOffsetPagination, ):
+    """
+    Limit/offset pagination for ranked results, which have no column to
+    page on. Rather than counting every match it fetches one extra row to
+    find out whether there is a next page.
+    """
+
+    template = None
+
+    @property
+    def max_limit(self):
+        return settings.MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = min(self.get_limit(request), self.max_limit)
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
@@ -0,0 +1,141 @@
+"""
+A cache of serialized profiles, keyed by profile id.
+
+Each entry holds the ProfileSerializer output for a profile along with its
+ProfileImageSerializer output (or the default image), which is everything
+ProfileDetail, ProfileImageList, ConnectionList and ProfileRecommendations
+need. Entries are deleted by the signal handlers below once the transaction
+changing anything they were built from commits, so a request reading in the
+meantime cannot cache the old version again. Hits and misses are counted in
+the cvconnect_cache_requests_total metric.
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.utils import timezone
+
+from api import metrics
+from api.models import Profile, ProfileImage, Skill, EducationDescription, EmploymentDescription
+from api.serializers import ProfileSerializer, ProfileImageSerializer
+
+
+DEFAULT_IMAGE = 'http://res.cloudinary.com/hjfb74ijq/image/upload/v1479381082/default_rutr05.jpg'
+
+
+def cache_key(profile_id):
+    return 'profile-cache:{}'.format(profile_id)
+
+
+def image_data(image):
+    if image is None:
+        return {'image': DEFAULT_IMAGE}
+
+    ret = OrderedDict(ProfileImageSerializer(instance=image).data)
+    if ret['image'] is None:
+        ret['image'] = DEFAULT_IMAGE
+    return ret
+
+
+def get_profiles(profile_ids):
+    """
+    Returns the cache entries for profile_ids in the same order, building
+    and caching the missing ones from a single page of queries. Profiles
+    that do not exist are left out.
+    """
+    entries = cache.get_many([cache_key(pk) for pk in profile_ids])
+    missing = [pk for pk in profile_ids if cache_key(pk) not in entries]
+    metrics.cache_requests.labels('profile', 'hit').inc(len(profile_ids) - len(missing))
+    metrics.cache_requests.labels('profile', 'miss').inc(len(missing))
+
+    if missing:
+        profiles = list(Profile.objects.filter(pk__in=missing).select_related('image'))
+        built = {}
+        for profile, data in zip(profiles, ProfileSerializer(profiles, many=True).data):
+            built[cache_key(profile.pk)] = {'profile': OrderedDict(data), 'image': image_data(profile.image)}
+        cache.set_many(built, timeout=settings.PROFILE_CACHE_TIMEOUT)
+        entries.update(built)
+
+    return [entries[cache_key(pk)] for pk in profile_ids if cache_key(pk) in entries]
+
+
+def get_profile(profile_id):
+    entries = get_profiles([profile_id])
+    return entries[0] if entries else None
+
+
+def with_image(entry):
+    """
+    Returns the profile from a cache entry with its image url and thumbnail,
+    as the list views return it
+    """
+    ret = OrderedDict(entry['profile'])
+    ret['image'] = entry['image']['image']
+    ret['thumbnail'] = entry['image'].get('thumbnail_128', None) or ret['image']
+    return ret
+
+
+def invalidate(profile_ids):
+    """
+    Bumps the profiles' updated timestamps, so their ETags change along with
+    the rest of the transaction, and deletes them from the cache once it
+    commits
+    """
+    profile_ids = list(profile_ids)
+    Profile.objects.filter(pk__in=profile_ids).update(updated=timezone.now())
+    keys = [cache_key(pk) for pk in profile_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_with_connections(profile_ids):
+    """
+    Invalidates profiles along with everyone connected to them, who show
+    their usernames
+    """
+    Connection = Profile.connections.through
+    connected = Connection.objects.filter(from_profile_id__in=profile_ids).values_list('to_profile_id', flat=True)
+    invalidate(list(profile_ids) + list(connected))
+
+
+def profile_changed(sender, instance, **kwargs):
+    # Saving the profile has already bumped its updated timestamp
+    key = cache_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def profile_deleted(sender, instance, **kwargs):
+    invalidate_with_connections([instance.pk])
+
+
+def profile_part_changed(sender, instance, **kwargs):
+    invalidate([instance.profile_id])
+
+
+def image_changed(sender, instance, **kwargs):
+    invalidate(Profile.objects.filter(image=instance).values_list('pk', flat=True))
+
+
+def user_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_with_connections(Profile.objects.filter(user=instance).values_list('pk', flat=True))
+
+
+def connections_changed(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        invalidate([instance.pk] + list(pk_set))
+    elif action == 'pre_clear':
+        invalidate_with_connections([instance.pk])
+
+
+for model in [Skill, EducationDescription, EmploymentDescription]:
+    post_save.connect(profile_part_changed, sender=model, dispatch_uid='profile-cache-' + model.__name__)
+    post_delete.connect(profile_part_changed, sender=model, dispatch_uid='profile-cache-delete-' + model.__name__)
+
+post_save.connect(profile_changed, sender=Profile, dispatch_uid='profile-cache-profile')
+pre_delete.connect(profile_deleted, sender=Profile, dispatch_uid='profile-cache-delete-profile')
+post_save.connect(image_changed, sender=ProfileImage, dispatch_uid='profile-cache-image')
+post_save.connect(user_changed, sender=User, dispatch_uid='profile-cache-user')
+m2m_changed.connect(connections_changed, sender=Profile.connections.through, dispatch_uid='profile-cache-connections')
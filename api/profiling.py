@@ -0,0 +1,136 @@
+"""
+Opt-in profiling of single requests.
+
+ProfilingMiddleware runs a request's view under cProfile when a staff user
+sends the settings.PROFILING_HEADER header (X-Profile: 1), or at random for
+settings.PROFILING_SAMPLE_RATE of all requests. Each capture is written to
+settings.PROFILING_DIR as <id>.pstats, which pstats and snakeviz can read,
+and <id>.json, describing the request, without its query string as that
+can hold tokens, along with every SQL query it ran and when. Only the newest
+settings.PROFILING_MAX_CAPTURES captures are kept. `python manage.py
+request_profiles` lists and summarizes them.
+"""
+import cProfile
+import json
+import os
+import random
+from time import perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorDebugWrapper
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+
+class TimelineCursorWrapper(CursorDebugWrapper, ):
+    """
+    Records when each query started, relative to the start of the request
+    """
+
+    def __init__(self, cursor, db, timeline, started):
+        super(TimelineCursorWrapper, self).__init__(cursor, db)
+        self.timeline = timeline
+        self.started = started
+
+    def record(self, method, *args):
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.timeline.append({
+                'db': self.db.alias,
+                'start_ms': round((start - self.started) * 1000, 3),
+                'duration_ms': round((perf_counter() - start) * 1000, 3),
+                'sql': self.db.queries_log[-1]['sql'],
+            })
+
+    def execute(self, sql, params=None):
+        return self.record(super(TimelineCursorWrapper, self).execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self.record(super(TimelineCursorWrapper, self).executemany, sql, param_list)
+
+
+def is_staff(request):
+    """
+    Returns whether the request is from a staff user, by its session or its
+    API token
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+
+    auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return False
+    return Token.objects.filter(key=auth[1], user__is_active=True, user__is_staff=True).exists()
+
+
+def capture_path(capture_id, extension):
+    return os.path.join(settings.PROFILING_DIR, '{}.{}'.format(capture_id, extension))
+
+
+def prune_captures():
+    """
+    Deletes all but the newest settings.PROFILING_MAX_CAPTURES captures
+    """
+    # Capture ids start with their time, so they sort oldest first
+    ids = sorted(name[:-len('.json')] for name in os.listdir(settings.PROFILING_DIR) if name.endswith('.json'))
+    for capture_id in ids[:max(len(ids) - settings.PROFILING_MAX_CAPTURES, 0)]:
+        for extension in ('json', 'pstats'):
+            try:
+                os.remove(capture_path(capture_id, extension))
+            except FileNotFoundError:
+                # Already pruned by another worker
+                pass
+
+
+class ProfilingMiddleware(object, ):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = request.META.get(settings.PROFILING_HEADER, '') == '1' and is_staff(request)
+        if not requested and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timeline = []
+        started = perf_counter()
+        patched = []
+        for connection in connections.all():
+            patched.append((connection, connection.force_debug_cursor))
+            connection.force_debug_cursor = True
+            connection.make_debug_cursor = \
+                lambda cursor, connection=connection: TimelineCursorWrapper(cursor, connection, timeline, started)
+
+        profile = cProfile.Profile()
+        try:
+            response = profile.runcall(self.get_response, request)
+        finally:
+            duration = perf_counter() - started
+            for connection, force_debug_cursor in patched:
+                connection.force_debug_cursor = force_debug_cursor
+                del connection.make_debug_cursor
+
+        capture_id = '{}-{}'.format(timezone.now().strftime('%Y%m%dT%H%M%S'), uuid4().hex[:8])
+        match = getattr(request, 'resolver_match', None)
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profile.dump_stats(capture_path(capture_id, 'pstats'))
+        with open(capture_path(capture_id, 'json'), 'w') as f:
+            json.dump({
+                'id': capture_id,
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'queries': timeline,
+            }, f, indent=2)
+        prune_captures()
+
+        if requested:
+            response['X-Profile-Id'] = capture_id
+        return response
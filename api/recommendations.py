@@ -0,0 +1,72 @@
+from django.db.models import Count
+
+from api.models import Profile, Skill, EmploymentDescription, SimilarProfile
+
+
+def shared_counts(queryset, field, profile, candidate_ids):
+    """
+    Returns a dict from candidate profile id to the number of distinct values
+    of field they share with profile
+    """
+    mine = queryset.filter(profile=profile).values(field)
+    return dict(queryset.filter(profile_id__in=candidate_ids, **{field + '__in': mine})
+                .values_list('profile_id').annotate(shared=Count(field, distinct=True)))
+
+
+def recommend_profiles(profile, limit):
+    """
+    Recommends up to limit profiles that profile is not connected to, ranked
+    by the number of connections they have in common, then by the number of
+    shared skills and employers.
+
+    Only the profile's 2-hop neighbourhood is looked at: the mutual
+    connection counts come from one aggregate query over the connections
+    table. If that neighbourhood is too small the remaining slots are filled
+    with the newest profiles. Returns a list of (profile, mutual count)
+    pairs.
+    """
+    if limit < 1:
+        return []
+
+    Connection = Profile.connections.through
+    connection_ids = Connection.objects.filter(from_profile=profile).values('to_profile_id')
+
+    mutual = dict(Connection.objects.filter(from_profile_id__in=connection_ids)
+                  .exclude(to_profile_id__in=connection_ids)
+                  .exclude(to_profile_id=profile.pk)
+                  .values_list('to_profile_id').annotate(mutual=Count('from_profile_id')))
+
+    # Skills and employers only break ties, so only look them up for the
+    # candidates that could still make the cut
+    ranked = sorted(mutual, key=lambda pk: -mutual[pk])
+    if len(ranked) > limit:
+        cutoff = mutual[ranked[limit - 1]]
+        ranked = [pk for pk in ranked if mutual[pk] >= cutoff]
+
+    skills = shared_counts(Skill.objects, 'name', profile, ranked)
+    employers = shared_counts(EmploymentDescription.objects, 'employer', profile, ranked)
+    ranked.sort(key=lambda pk: (-mutual[pk], -skills.get(pk, 0), -employers.get(pk, 0), pk))
+    ranked = ranked[:limit]
+
+    if len(ranked) < limit:
+        ranked += Profile.objects.exclude(pk__in=connection_ids).exclude(pk__in=ranked + [profile.pk]) \
+            .order_by('-pk').values_list('pk', flat=True)[:limit - len(ranked)]
+
+    profiles = Profile.objects.select_related('image').in_bulk(ranked)
+    return [(profiles[pk], mutual.get(pk, 0)) for pk in ranked]
+
+
+def recommend_similar_profiles(profile, limit):
+    """
+    Recommends up to limit profiles that profile is not connected to, ranked
+    by how similar their skills are, from the neighbours stored by the
+    compute_skill_similarity command. Returns a list of (profile, similarity)
+    pairs.
+    """
+    if limit < 1:
+        return []
+
+    connection_ids = Profile.connections.through.objects.filter(from_profile=profile).values('to_profile_id')
+    similar = SimilarProfile.objects.filter(profile=profile).exclude(similar_id__in=connection_ids) \
+        .select_related('similar__image').order_by('-score')[:limit]
+    return [(s.similar, s.score) for s in similar]
@@ -0,0 +1,145 @@
+"""
+The search index behind the Search view.
+
+Every searchable thing (a profile's name, a job posting's position, a skill
+and a profile's location) has a SearchEntry row holding the text that is
+searched along with everything needed to display the result, so a search
+is a single query on one indexed table. On PostgreSQL the searched text has
+a trigram GIN index (see migration 0021) and results are ranked by trigram
+similarity; other databases fall back to ranking exact and prefix matches
+first.
+
+The index is kept up to date by the signal handlers below and can be rebuilt
+from scratch with `python manage.py rebuild_search_index`.
+"""
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, When, Value, FloatField
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Profile, JobPosting, Skill, SearchEntry
+
+
+def profile_image_url(profile):
+    if profile.image_id is None:
+        return None
+    if profile.image.thumbnail_64:
+        return profile.image.thumbnail_64.url
+    if profile.image.image:
+        return profile.image.image.url
+    return None
+
+
+def index_profile(profile):
+    """
+    Indexes a profile's name and location and refreshes the name shown on
+    the entries of its skills
+    """
+    username = profile.user.username
+    image = profile_image_url(profile)
+
+    for subtype, text in [('profiles', profile.full_name), ('locations', profile.country)]:
+        SearchEntry.objects.update_or_create(subtype=subtype, object_id=profile.pk, defaults={
+            'profile': profile,
+            'username': username,
+            'text': text,
+            'visible_id': profile.full_name,
+            'match': text,
+            'image': image,
+        })
+
+    SearchEntry.objects.filter(subtype='skills', profile=profile).update(
+        username=username, visible_id=profile.full_name)
+
+
+def index_job_posting(job):
+    match = job.position + " at " + job.company
+    SearchEntry.objects.update_or_create(subtype='jobs', object_id=job.pk, defaults={
+        'text': job.position,
+        'visible_id': match,
+        'match': match,
+    })
+
+
+def index_skill(skill):
+    SearchEntry.objects.update_or_create(subtype='skills', object_id=skill.pk, defaults={
+        'profile_id': skill.profile_id,
+        'username': skill.profile.user.username,
+        'text': skill.name,
+        'visible_id': skill.profile.full_name,
+        'match': skill.name,
+    })
+
+
+def rebuild_index():
+    SearchEntry.objects.all().delete()
+
+    for profile in Profile.objects.select_related('user', 'image').iterator():
+        index_profile(profile)
+    for job in JobPosting.objects.iterator():
+        index_job_posting(job)
+    for skill in Skill.objects.select_related('profile__user').iterator():
+        index_skill(skill)
+
+
+def search(query):
+    """
+    Returns the SearchEntries whose text contains query, best matches first
+    """
+    entries = SearchEntry.objects.all()
+    if not query:
+        return entries.order_by('subtype', 'id')
+
+    if connection.vendor == 'postgresql':
+        rank = TrigramSimilarity('text', query)
+    else:
+        rank = Case(
+            When(text__iexact=query, then=Value(1.0)),
+            When(text__istartswith=query, then=Value(0.5)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    return entries.filter(text__icontains=query).annotate(rank=rank).order_by('-rank', 'subtype', 'id')
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_profile(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    SearchEntry.objects.filter(profile__user=instance).update(username=instance.username)
+
+
+@receiver(post_save, sender=JobPosting)
+def job_posting_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_job_posting(instance)
+
+
+@receiver(post_save, sender=Skill)
+def skill_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_skill(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    SearchEntry.objects.filter(subtype__in=['profiles', 'locations'], object_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=JobPosting)
+def job_posting_deleted(sender, instance, **kwargs):
+    SearchEntry.objects.filter(subtype='jobs', object_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=Skill)
+def skill_deleted(sender, instance, **kwargs):
+    SearchEntry.objects.filter(subtype='skills', object_id=instance.pk).delete()
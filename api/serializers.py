@@ -1,14 +1,28 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import models
+from django.db.models import prefetch_related_objects
 from django.utils.timesince import timesince
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
 from drf_extra_fields.fields import Base64ImageField
 
+from api.metrics import TimedSerializerMixin, TimedListSerializer
 from api.models import Profile, JobPosting, JobApplication, EducationDescription, EmploymentDescription, Skill, \
     Company, SocialLink, CompanyManager, ProfileImage, FeedPost
+from api.search import profile_image_url
+from api.sparse import SparseFieldsMixin, wants
+from api.thumbnails import decoded_pixels
+
+
+# The fields ProfileSerializer adds to those of the model, in the order they
+# are output
+PROFILE_DERIVED_FIELDS = ['username', 'email', 'connections', 'current_company', 'current_position', 'current_edu']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
 
     password = serializers.CharField(max_length=100, write_only=True)
 
@@ -51,65 +65,217 @@ class UserSerializer(serializers.ModelSerializer):
         return True
 
 
-class ProfileSerializer(serializers.ModelSerializer, ):
+def current_employment(positions):
+    """
+    Returns the (position, company) of the latest unfinished employment in
+    positions, which must be ordered by start_date
+    """
+    current_position = None
+    current_company = None
+    for p in positions:
+        if not p.end_date:
+            current_position = p.role
+            current_company = p.employer
+
+    if current_company is None and current_position is None:
+        current_position = "Not Employed"
+        current_company = "Not Employed"
+
+    return current_position, current_company
+
+
+def prefetch_profile_fields(profiles, fields=None):
+    """
+    Computes the derived fields of ProfileSerializer in fields (all of them
+    by default) for a list of profiles in a fixed number of queries, no
+    matter how many profiles there are, and stores them on each profile in
+    _derived_fields
+    """
+    wanted = [name for name in PROFILE_DERIVED_FIELDS if wants(fields, name)]
+    profiles = [profile for profile in profiles
+                if not all(name in getattr(profile, '_derived_fields', {}) for name in wanted)]
+    if not profiles:
+        return
+
+    lookups = []
+    if wants(fields, 'username', 'email'):
+        lookups.append('user')
+    if wants(fields, 'connections'):
+        lookups.append('connections__user')
+    prefetch_related_objects(profiles, *lookups)
+
+    ids = [profile.pk for profile in profiles]
+
+    positions = {}
+    if wants(fields, 'current_company', 'current_position'):
+        for p in EmploymentDescription.objects.filter(profile_id__in=ids).order_by('start_date'):
+            positions.setdefault(p.profile_id, []).append(p)
+
+    current_edu = {}
+    if wants(fields, 'current_edu'):
+        for edu in EducationDescription.objects.filter(profile_id__in=ids).order_by('date_attained'):
+            current_edu.setdefault(edu.profile_id, edu.institution)
+
+    for profile in profiles:
+        derived = getattr(profile, '_derived_fields', {})
+        if wants(fields, 'username', 'email'):
+            derived['username'] = profile.user.username
+            derived['email'] = profile.user.email
+        if wants(fields, 'connections'):
+            derived['connections'] = [connection.user.username for connection in profile.connections.all()]
+        if wants(fields, 'current_company', 'current_position'):
+            derived['current_position'], derived['current_company'] = \
+                current_employment(positions.get(profile.pk, []))
+        if wants(fields, 'current_edu'):
+            derived['current_edu'] = current_edu.get(profile.pk, "no institution")
+        profile._derived_fields = derived
+
+
+class ProfileListSerializer(TimedListSerializer, ):
+    """
+    Serializes a page of profiles, computing the derived fields for the
+    whole page at once instead of once per profile
+    """
+
+    def to_representation(self, data):
+        profiles = list(data.all() if isinstance(data, models.Manager) else data)
+        prefetch_profile_fields(profiles, self.child.requested_fields)
+        return super(ProfileListSerializer, self).to_representation(profiles)
+
+
+class ProfileSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     def to_representation(self, instance):
+        fields = self.requested_fields
+        prefetch_profile_fields([instance], fields)
         ret = super(ProfileSerializer, self).to_representation(instance)
-        ret['username'] = instance.user.username
-        ret['email'] = instance.user.email
-
-        ret['connections'] = instance.connections.all().values_list('user__username', flat=True)
-
-        position = EmploymentDescription.objects.filter(profile=instance).order_by('start_date')
-        current_position = None
-        current_company = None
-        for p in position:
-            if not p.end_date:
-                current_position = p.role
-                current_company = p.employer
-
-        if current_company is None and current_position is None:
-            current_position = "Not Employed"
-            current_company = "Not Employed"
-
-        ret['current_company'] = current_company
-        ret['current_position'] = current_position
-
-        edu = EducationDescription.objects.filter(profile=instance).order_by('date_attained')
-        if edu.exists():
-            ret['current_edu'] = edu.first().institution
-        else:
-            ret['current_edu'] = "no institution"
-
-
+        # Bumped whenever anything cached about the profile changes, which
+        # is for the ETags rather than for clients
+        if not fields or 'updated' not in fields:
+            ret.pop('updated', None)
+        for name in PROFILE_DERIVED_FIELDS:
+            if wants(fields, name):
+                ret[name] = instance._derived_fields[name]
         return ret
 
     class Meta:
         model = Profile
+        exclude = ('connection_count', )
+        list_serializer_class = ProfileListSerializer
 
 
-class ProfileImageSerializer(serializers.ModelSerializer, ):
+class ProfileImageSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     image = Base64ImageField(required=False)
 
     class Meta:
         model = ProfileImage
+        read_only_fields = ['thumbnail_64', 'thumbnail_128', 'thumbnail_512']
+
+    def validate_image(self, value):
+        # Checked before anything decodes the image
+        if value is not None and decoded_pixels(value) > settings.MAX_IMAGE_PIXELS:
+            raise serializers.ValidationError(
+                'Image is too large, at most {} pixels can be decoded'.format(settings.MAX_IMAGE_PIXELS))
+        return value
+
+
+class ProfileImageUploadSerializer(ProfileImageSerializer, ):
+    """
+    Accepts the image as a multipart file upload rather than Base64
+    """
+
+    image = serializers.ImageField()
 
 
-class JobPostingSerializer(serializers.ModelSerializer, ):
+class JobPostingSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     recruiter = serializers.SlugRelatedField(queryset=User.objects.all(), slug_field='username')
 
     def to_representation(self, instance):
         ret = super(JobPostingSerializer, self).to_representation(instance)
-        ret['created'] = timesince(instance.created)
+        if 'created' in ret:
+            ret['created'] = timesince(instance.created)
         return ret
 
     class Meta:
         model = JobPosting
 
 
-class JobApplicationSerializer(serializers.ModelSerializer, ):
+def prefetch_application_fields(applications, fields=None):
+    """
+    Loads what JobApplicationSerializer needs for fields (all of them by
+    default) of a list of job applications in a fixed number of queries:
+    the applicants, job postings, current employment and skills. The
+    current position and company and the skill names of each applicant are
+    stored on its application in _derived_fields.
+    """
+    lookups = []
+    if wants(fields, 'username'):
+        lookups.append('profile__user')
+    elif wants(fields, 'full_name'):
+        lookups.append('profile')
+    if wants(fields, 'job_posting_company', 'job_posting_position'):
+        lookups.append('job_posting')
+    prefetch_related_objects(applications, *lookups)
+
+    wanted = [name for name in ['current_position', 'current_company', 'skills'] if wants(fields, name)]
+    applications = [application for application in applications
+                    if not all(name in getattr(application, '_derived_fields', {}) for name in wanted)]
+    if not applications:
+        return
+
+    ids = set(application.profile_id for application in applications)
+
+    positions = {}
+    if wants(fields, 'current_position', 'current_company'):
+        for p in EmploymentDescription.objects.filter(profile_id__in=ids).order_by('start_date'):
+            positions.setdefault(p.profile_id, []).append(p)
+
+    skills = {}
+    if wants(fields, 'skills'):
+        for profile_id, name in Skill.objects.filter(profile_id__in=ids).order_by('id') \
+                .values_list('profile_id', 'name'):
+            skills.setdefault(profile_id, []).append(name)
+
+    for application in applications:
+        derived = getattr(application, '_derived_fields', {})
+        if wants(fields, 'current_position', 'current_company'):
+            derived['current_position'], derived['current_company'] = \
+                current_employment(positions.get(application.profile_id, []))
+        if wants(fields, 'skills'):
+            derived['skills'] = skills.get(application.profile_id, [])
+        application._derived_fields = derived
+
+
+class JobApplicationListSerializer(TimedListSerializer, ):
+    """
+    Serializes a page of job applications, looking up the applicants'
+    details once for the whole page
+    """
+
+    def to_representation(self, data):
+        applications = list(data.all() if isinstance(data, models.Manager) else data)
+        prefetch_application_fields(applications, self.child.requested_fields)
+        return super(JobApplicationListSerializer, self).to_representation(applications)
+
+
+class JobApplicationSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
+
+    # How to get each field of the output from an application
+    output_fields = OrderedDict([
+        ('app_id', lambda application: application.id),
+        ('username', lambda application: application.profile.user.username),
+        ('full_name', lambda application: application.profile.full_name),
+        ('current_company', lambda application: application._derived_fields['current_company']),
+        ('current_position', lambda application: application._derived_fields['current_position']),
+        ('skills', lambda application: ', '.join(application._derived_fields['skills'])),
+        ('status', lambda application: application.status),
+        ('job_posting', lambda application: application.job_posting_id),
+        ('profile', lambda application: application.profile_id),
+        ('job_posting_company', lambda application: application.job_posting.company),
+        ('job_posting_position', lambda application: application.job_posting.position),
+    ])
 
     def is_valid(self, raise_exception=False):
 
@@ -122,84 +288,151 @@ class JobApplicationSerializer(serializers.ModelSerializer, ):
         return valid
 
     def to_representation(self, instance):
-
-        position = EmploymentDescription.objects.filter(profile=instance.profile).order_by('start_date')
-        current_position = None
-        current_company = None
-        for p in position:
-            if not p.end_date:
-                current_position = p.role
-                current_company = p.employer
-
-        if current_company is None and current_position is None:
-            current_position = "Not Employed"
-            current_company = "Not Employed"
-
-
-        ret = {
-            'app_id': instance.id,
-            'username': instance.profile.user.username,
-            'full_name': instance.profile.full_name,
-            'current_company': current_company,
-            'current_position': current_position,
-            'skills': ', '.join(Skill.objects.filter(profile=instance.profile).values_list('name', flat=True)),
-            'status': instance.status,
-            'job_posting': instance.job_posting.id,
-            'profile': instance.profile.id,
-            'job_posting_company': instance.job_posting.company,
-            'job_posting_position': instance.job_posting.position
-        }
-        return ret
+        fields = self.requested_fields
+        prefetch_application_fields([instance], fields)
+        return dict((name, get(instance)) for name, get in self.output_fields.items() if wants(fields, name))
 
     class Meta:
         model = JobApplication
+        list_serializer_class = JobApplicationListSerializer
 
 
-class EducationDescriptionSerializer(serializers.ModelSerializer, ):
+class EducationDescriptionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     class Meta:
         model = EducationDescription
 
 
-class EmploymentDescriptionSerializer(serializers.ModelSerializer, ):
+class EmploymentDescriptionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     class Meta:
         model = EmploymentDescription
 
 
-class SkillSerializer(serializers.ModelSerializer, ):
+class SkillSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     class Meta:
         model = Skill
 
 
-class CompanySerializer(serializers.ModelSerializer, ):
+class BulkEducationDescriptionSerializer(EducationDescriptionSerializer, ):
+    """
+    Used by EducationDescriptionBulk, which sets the profile from the url
+    """
+
+    class Meta(EducationDescriptionSerializer.Meta):
+        read_only_fields = ('profile', )
+
+
+class BulkEmploymentDescriptionSerializer(EmploymentDescriptionSerializer, ):
+    """
+    Used by EmploymentDescriptionBulk, which sets the profile from the url
+    """
+
+    class Meta(EmploymentDescriptionSerializer.Meta):
+        read_only_fields = ('profile', )
+
+
+class BulkSkillSerializer(SkillSerializer, ):
+    """
+    Used by SkillBulk, which sets the profile from the url
+    """
+
+    class Meta(SkillSerializer.Meta):
+        read_only_fields = ('profile', )
+
+
+class CompanySerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     class Meta:
         model = Company
 
 
-class SocialLinkSerializer(serializers.ModelSerializer, ):
+class SocialLinkSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     class Meta:
         model = SocialLink
 
 
-class CompanyManagerSerializer(serializers.ModelSerializer, ):
+class CompanyManagerSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     class Meta:
         model = CompanyManager
 
 
-class FeedPostSerializer(serializers.ModelSerializer, ):
+def prefetch_post_authors(posts):
+    """
+    Looks up the profiles of the authors of posts in one query, storing
+    each one on its post along with the author's user
+    """
+    posts = [post for post in posts if not hasattr(post, '_author')]
+    if not posts:
+        return
+
+    profiles = Profile.objects.filter(user_id__in=set(post.user_id for post in posts)).select_related('user', 'image')
+    authors = dict((profile.user_id, profile) for profile in profiles)
+    for post in posts:
+        post._author = authors.get(post.user_id, None)
+        if post._author is not None:
+            post.user = post._author.user
+
+
+class FeedPostListSerializer(TimedListSerializer, ):
+    """
+    Serializes a page of feed posts, looking up their authors once for the
+    whole page
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        if wants(self.child.requested_fields, 'user', 'full_name', 'image'):
+            prefetch_post_authors(posts)
+        return super(FeedPostListSerializer, self).to_representation(posts)
+
+
+class FeedPostSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer, ):
 
     user = serializers.SlugRelatedField(queryset=User.objects.all(), slug_field='username')
 
     def to_representation(self, instance):
+        fields = self.requested_fields
+        if wants(fields, 'user', 'full_name', 'image'):
+            prefetch_post_authors([instance])
         ret = super(FeedPostSerializer, self).to_representation(instance)
-        ret['full_name'] = Profile.objects.get(user__username=ret['user']).full_name
-        ret['created'] = timesince(instance.created)
+        if wants(fields, 'full_name'):
+            ret['full_name'] = instance._author.full_name if instance._author else None
+        if wants(fields, 'image'):
+            ret['image'] = profile_image_url(instance._author) if instance._author else None
+        if 'created' in ret:
+            ret['created'] = timesince(instance.created)
         return ret
 
     class Meta:
-        model = FeedPost
\ No newline at end of file
+        model = FeedPost
+        list_serializer_class = FeedPostListSerializer
+
+
+class SearchEntrySerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.BaseSerializer, ):
+
+    def to_representation(self, instance):
+        if instance.subtype == 'jobs':
+            ret = OrderedDict([
+                ('type', 'jobs'),
+                ('subtype', 'jobs'),
+                ('id', instance.object_id),
+                ('visible_id', instance.visible_id),
+                ('match', instance.match),
+            ])
+        else:
+            ret = OrderedDict([
+                ('type', 'profiles'),
+                ('subtype', instance.subtype),
+                ('id', instance.username),
+                ('visible_id', instance.visible_id),
+            ])
+            if instance.subtype == 'profiles':
+                ret['image'] = instance.image
+            ret['match'] = instance.match
+
+        fields = self.requested_fields
+        return OrderedDict((name, value) for name, value in ret.items() if wants(fields, name))
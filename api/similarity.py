@@ -0,0 +1,74 @@
+"""
+Offline computation of skill similarity between profiles.
+
+Every profile becomes a row of a sparse profile x skill matrix weighted by
+proficiency and normalised to unit length, so the dot product of two rows is
+their cosine similarity. Multiplying a batch of rows by the transpose of the
+whole matrix gives the similarity of those profiles to every other profile,
+from which the top k are kept.
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from api.models import Skill
+
+
+def skill_matrix():
+    """
+    Returns the normalised profile x skill matrix along with the profile id
+    of each row. Skill names are compared ignoring case and surrounding
+    whitespace, and a proficiency of 0 still counts as having the skill.
+    """
+    profile_rows = {}
+    skill_columns = {}
+    rows, columns, weights = [], [], []
+
+    for profile_id, name, proficiency in Skill.objects.values_list('profile_id', 'name', 'proficiency').iterator():
+        rows.append(profile_rows.setdefault(profile_id, len(profile_rows)))
+        columns.append(skill_columns.setdefault(name.strip().lower(), len(skill_columns)))
+        weights.append(max(proficiency, 1))
+
+    matrix = csr_matrix((np.array(weights, dtype=np.float32), (rows, columns)),
+                        shape=(len(profile_rows), len(skill_columns)))
+
+    # Duplicate skills on a profile are summed by csr_matrix, then every row
+    # is scaled to unit length
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = csr_matrix(matrix.multiply(1 / norms[:, np.newaxis]))
+
+    profile_ids = np.empty(len(profile_rows), dtype=np.int64)
+    for profile_id, row in profile_rows.items():
+        profile_ids[row] = profile_id
+
+    return matrix, profile_ids
+
+
+def top_similar(matrix, profile_ids, k, batch_size):
+    """
+    Yields (profile id, similar profile id, score) for the k most similar
+    profiles to each profile, skipping profiles with nothing in common
+    """
+    transposed = matrix.T.tocsc()
+    k = min(k, matrix.shape[0] - 1)
+    if k <= 0:
+        return
+
+    for start in range(0, matrix.shape[0], batch_size):
+        # Older scipy rejects slices that run past the last row
+        scores = (matrix[start:min(start + batch_size, matrix.shape[0])] * transposed).toarray()
+        batch = np.arange(scores.shape[0])
+
+        # A profile is not similar to itself
+        scores[batch, start + batch] = 0
+
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = scores[batch[:, np.newaxis], best]
+        order = np.argsort(-best_scores, axis=1)
+        best = best[batch[:, np.newaxis], order]
+        best_scores = best_scores[batch[:, np.newaxis], order]
+
+        for row, columns, row_scores in zip(batch, best, best_scores):
+            for column, score in zip(columns, row_scores):
+                if score > 0:
+                    yield profile_ids[start + row], profile_ids[column], float(score)
@@ -0,0 +1,68 @@
+"""
+Sparse fieldsets: any endpoint can be asked for only some of the fields of
+the rows it returns with ?fields=, a comma separated list of field names,
+e.g. /api/profiles/?fields=username,full_name,image.
+
+Serializers that mix in SparseFieldsMixin leave out the other fields, and
+those with derived fields skip the queries behind the ones left out. Views
+that return already serialized rows, e.g. from the profile cache, prune them
+with prune().
+"""
+from collections import OrderedDict
+
+from django.utils.functional import cached_property
+
+
+def requested_fields(request):
+    """
+    Returns the set of field names asked for in the request's ?fields=
+    parameter, or None when every field is wanted
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+
+    fields = request.GET.get('fields', None)
+    if fields is None:
+        return None
+    return set(name.strip() for name in fields.split(',') if name.strip())
+
+
+def wants(fields, *names):
+    """
+    Returns whether any of names is in fields, as returned by
+    requested_fields
+    """
+    return fields is None or any(name in fields for name in names)
+
+
+def prune(request, data):
+    """
+    Leaves out of a serialized row, or list of rows, the fields not asked
+    for in the request
+    """
+    fields = requested_fields(request)
+    if fields is None:
+        return data
+    if isinstance(data, list):
+        return [prune(request, row) for row in data]
+    return OrderedDict((name, value) for name, value in data.items() if name in fields)
+
+
+class SparseFieldsMixin(object, ):
+    """
+    Outputs only the fields asked for in the ?fields= parameter of the
+    request in the serializer's context. Nested serializers are left whole.
+    """
+
+    @property
+    def requested_fields(self):
+        root = self.root
+        if root is not self and root is not self.parent:
+            return None
+        return requested_fields(self.context.get('request', None))
+
+    @cached_property
+    def _readable_fields(self):
+        fields = self.requested_fields
+        return [field for field in self.fields.values()
+                if not field.write_only and (fields is None or field.field_name in fields)]
@@ -0,0 +1,98 @@
+"""
+Streamed list responses.
+
+List views that mix in StreamingListMixin can be asked for every row at
+once, rather than a page, as a JSON array with ?format=json-stream or as
+newline delimited JSON with ?format=ndjson (or Accept: application/x-ndjson).
+The rows are read with .iterator() and serialized settings.STREAM_CHUNK_SIZE
+at a time, each chunk being written out before the next is read, so memory
+use stays flat however many rows there are and the first bytes are sent as
+soon as the first chunk is ready.
+"""
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+class JSONStreamRenderer(BaseRenderer, ):
+    """
+    Writes the rows as one JSON array
+    """
+    media_type = 'application/json'
+    format = 'json-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data).encode(self.charset)
+
+    def stream(self, chunks):
+        separator = '['
+        for rows in chunks:
+            for row in rows:
+                yield separator + dumps(row)
+                separator = ','
+        yield '[]' if separator == '[' else ']'
+
+
+class NDJSONRenderer(BaseRenderer, ):
+    """
+    Writes each row as a line of JSON
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (dumps(data) + '\n').encode(self.charset)
+
+    def stream(self, chunks):
+        for rows in chunks:
+            if rows:
+                yield ''.join(dumps(row) + '\n' for row in rows)
+
+
+class StreamingListMixin(object, ):
+    """
+    Lets a generic list view stream every row when one of the streaming
+    renderers is asked for. These have a stream() method as well as
+    render(), which is still used for responses that are not streamed, such
+    as errors. The rows are in the order they are paged in.
+    """
+    renderer_classes = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (JSONStreamRenderer, NDJSONRenderer)
+
+    def list(self, request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not hasattr(renderer, 'stream'):
+            return super(StreamingListMixin, self).list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.ordered:
+            queryset = queryset.order_by(getattr(self, 'ordering', '-id'))
+
+        return StreamingHttpResponse(renderer.stream(self.serialized_chunks(queryset)),
+                                     content_type='{}; charset={}'.format(renderer.media_type, renderer.charset))
+
+    def serialized_chunks(self, queryset):
+        """
+        Yields the serialized rows of queryset a chunk at a time, so list
+        serializers that look up related rows do it once per chunk
+        """
+        rows = queryset.iterator()
+        while True:
+            chunk = list(islice(rows, settings.STREAM_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield self.get_serializer(chunk, many=True).data
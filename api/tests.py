@@ -1,3 +1,1690 @@
-from django.test import TestCase
+import asyncio
+import json
+from concurrent.futures import Executor, Future
+from datetime import date, timedelta
+import re
+from io import BytesIO, StringIO
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from threading import Thread
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import profile_cache
+from api.events import get_broker
+from api.autocomplete import index as autocomplete_index
+from api.bulk import apply_changes
+from api.graph import graph, ConnectionGraph
+from api.models import Profile, EducationDescription, EmploymentDescription, JobPosting, Skill, Company, \
+    OutboxEmail, FeedPost, TimelineEntry, JobApplication, ForgottenPasswordToken, CompanyManager, SearchEntry
+from api.timeline import pulled_user_ids
+from api.urls import urlpatterns
+from cvconnect_backend.asgi import application as asgi_application
+
+
+def create_profile(username, **kwargs):
+    user = User.objects.create(username=username, email='{}@cvconnect.com'.format(username))
+    fields = {'full_name': username, 'preferred_name': username, 'country': 'Australia'}
+    fields.update(kwargs)
+    return Profile.objects.create(user=user, **fields)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class APITestCase(TestCase, ):
+    """
+    Runs each test with an empty in-memory cache. TestCase wraps each test in
+    a transaction that never commits, so on-commit callbacks are run straight
+    away, as they are outside a transaction.
+    """
+
+    def setUp(self):
+        cache.clear()
+        on_commit = mock.patch('django.db.transaction.on_commit', lambda func, using=None: func())
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+
+
+class ProfileSerializerTests(APITestCase, ):
+
+    def add_profiles(self, count):
+        for i in range(count):
+            profile = create_profile('user{}'.format(Profile.objects.count()))
+            EmploymentDescription.objects.create(profile=profile, location='Sydney', employer='Nozama',
+                                                 role='Engineer', start_date=date(2015, 1, 1))
+            EducationDescription.objects.create(profile=profile, institution='UNSW', degree='BE',
+                                                date_started=date(2010, 1, 1), date_attained=date(2014, 1, 1))
+            for other in Profile.objects.exclude(pk=profile.pk):
+                profile.connections.add(other)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_profile_list_query_count_is_constant(self):
+        self.add_profiles(2)
+        small = self.count_queries('/api/profiles/')
+        self.add_profiles(10)
+        self.assertEqual(self.count_queries('/api/profiles/'), small)
+
+    def test_connection_list_query_count_is_constant(self):
+        self.add_profiles(2)
+        small = self.count_queries('/api/profiles/user0/connections/')
+        self.add_profiles(10)
+        self.assertEqual(self.count_queries('/api/profiles/user0/connections/'), small)
+
+    def test_list_matches_detail(self):
+        self.add_profiles(3)
+        create_profile('unemployed')
+        listed = {profile['username']: profile for profile in self.client.get('/api/profiles/').data['results']}
+        for username, profile in listed.items():
+            detail = self.client.get('/api/profiles/{}/'.format(username)).data
+            self.assertEqual(detail, profile)
+
+        self.assertEqual(listed['user0']['current_position'], 'Engineer')
+        self.assertEqual(listed['user0']['current_edu'], 'UNSW')
+        self.assertEqual(sorted(listed['user0']['connections']), ['user1', 'user2'])
+        self.assertEqual(listed['unemployed']['current_company'], 'Not Employed')
+        self.assertEqual(listed['unemployed']['current_edu'], 'no institution')
+
+
+class KeysetPaginationTests(APITestCase, ):
+
+    def test_pages_cover_every_row_once(self):
+        for i in range(7):
+            create_profile('user{}'.format(i))
+
+        usernames = []
+        url = '/api/profiles/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 3)
+            usernames.extend(profile['username'] for profile in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(usernames, ['user{}'.format(i) for i in reversed(range(7))])
+
+    @override_settings(MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped(self):
+        for i in range(5):
+            create_profile('user{}'.format(i))
+
+        response = self.client.get('/api/profiles/?page_size=50')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class SearchTests(APITestCase, ):
+
+    def setUp(self):
+        super(SearchTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.matt.full_name = 'Matt Egan'
+        self.matt.save()
+        Skill.objects.create(profile=self.matt, name='Python', proficiency=5)
+        JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Python Developer')
+
+    def search(self, query):
+        return self.client.get('/api/search/{}/'.format(query)).data['results']
+
+    def test_results_are_ranked(self):
+        results = self.search('Python')
+        self.assertEqual([result['subtype'] for result in results], ['skills', 'jobs'])
+        self.assertEqual(results[0], {'type': 'profiles', 'subtype': 'skills', 'id': 'matt',
+                                      'visible_id': 'Matt Egan', 'match': 'Python'})
+        self.assertEqual(results[1]['visible_id'], 'Python Developer at Nozama')
+
+    def test_index_follows_changes(self):
+        self.matt.full_name = 'Matthew Egan'
+        self.matt.save()
+        self.assertEqual(self.search('Matthew')[0]['visible_id'], 'Matthew Egan')
+        self.assertEqual(self.search('Python')[0]['visible_id'], 'Matthew Egan')
+
+        JobPosting.objects.all().delete()
+        Skill.objects.all().delete()
+        self.assertEqual(self.search('Python'), [])
+
+    def test_results_are_limited(self):
+        for i in range(5):
+            Skill.objects.create(profile=self.matt, name='Java {}'.format(i), proficiency=3)
+
+        response = self.client.get('/api/search/Java/?limit=2')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class AutocompleteTests(APITestCase, ):
+
+    def setUp(self):
+        super(AutocompleteTests, self).setUp()
+        autocomplete_index.clear()
+        self.matt = create_profile('matt')
+        self.matt.full_name = 'Matt Egan'
+        self.matt.save()
+        Skill.objects.create(profile=self.matt, name='Maths', proficiency=4)
+        Company.objects.create(name='Mattel', description='Toys', industry='Retail')
+
+    def complete(self, prefix):
+        response = self.client.get('/api/autocomplete/', {'q': prefix})
+        return [(completion['text'], completion['type']) for completion in response.data]
+
+    def test_completions_do_not_query_the_database(self):
+        autocomplete_index.build()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete('matt e'), [('Matt Egan', 'profiles')])
+
+    def test_completions_are_sorted(self):
+        self.assertEqual(self.complete('MAT'), [('Maths', 'skills'), ('matt', 'usernames'),
+                                                ('Matt Egan', 'profiles'), ('Mattel', 'companies')])
+
+    def test_index_follows_changes(self):
+        self.complete('m')
+        skill = Skill.objects.create(profile=self.matt, name='Machine Learning', proficiency=2)
+        JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Manager')
+        self.assertEqual(self.complete('ma')[:2], [('Machine Learning', 'skills'), ('Manager', 'jobs')])
+
+        skill.name = 'Deep Learning'
+        skill.save()
+        self.assertEqual(self.complete('mac'), [])
+        self.assertEqual(self.complete('deep'), [('Deep Learning', 'skills')])
+
+        Skill.objects.create(profile=self.matt, name='Deep Learning', proficiency=1)
+        skill.delete()
+        self.assertEqual(self.complete('deep'), [('Deep Learning', 'skills')])
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        self.complete('m')
+        autocomplete_index.built -= settings.AUTOCOMPLETE_MAX_AGE + 1
+        Company.objects.bulk_create([Company(name='Matrix', description='', industry='')])
+
+        with mock.patch('api.autocomplete.Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertNotIn(('Matrix', 'companies'), self.complete('matr'))
+        thread.assert_called_once_with(target=autocomplete_index.rebuild, daemon=True)
+
+        autocomplete_index.build()
+        self.assertEqual(self.complete('matr'), [('Matrix', 'companies')])
+
+
+class RecommendationTests(APITestCase, ):
+
+    def connect(self, first, second):
+        first.connections.add(second)
+
+    def test_ranked_by_mutual_connections(self):
+        me, a, b, c, d, e = [create_profile(username) for username in ['me', 'a', 'b', 'c', 'd', 'e']]
+        self.connect(me, a)
+        self.connect(me, b)
+        self.connect(a, c)
+        self.connect(a, d)
+        self.connect(b, d)
+        self.connect(b, me)
+
+        response = self.client.get('/api/profiles/me/recommendations/')
+        self.assertEqual([(profile['username'], profile['mutual_connections']) for profile in response.data],
+                         [('d', 2), ('c', 1), ('e', 0)])
+
+    def test_shared_skills_break_ties(self):
+        me, a, b, c = [create_profile(username) for username in ['me', 'a', 'b', 'c']]
+        self.connect(me, a)
+        self.connect(a, b)
+        self.connect(a, c)
+        Skill.objects.create(profile=me, name='Python', proficiency=5)
+        Skill.objects.create(profile=c, name='Python', proficiency=1)
+
+        response = self.client.get('/api/profiles/me/recommendations/?limit=1')
+        self.assertEqual([profile['username'] for profile in response.data], ['c'])
+
+    def test_unknown_profile(self):
+        self.assertEqual(self.client.get('/api/profiles/nobody/recommendations/').status_code, 404)
+
+    def test_limit_must_be_positive(self):
+        create_profile('me')
+        for limit in ['0', '-1']:
+            response = self.client.get('/api/profiles/me/recommendations/', {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+
+class SkillSimilarityTests(APITestCase, ):
+
+    def test_skills_mode(self):
+        me, a, b, c = [create_profile(username) for username in ['me', 'a', 'b', 'c']]
+        for profile, skills in [(me, [('Python', 5), ('Django', 4)]),
+                                (a, [('python', 5), ('Django', 3)]),
+                                (b, [('Python', 1), ('Java', 5)]),
+                                (c, [('Haskell', 5)])]:
+            for name, proficiency in skills:
+                Skill.objects.create(profile=profile, name=name, proficiency=proficiency)
+
+        call_command('compute_skill_similarity', top_k=2, batch_size=3, stdout=StringIO())
+
+        response = self.client.get('/api/profiles/me/recommendations/?mode=skills')
+        self.assertEqual([profile['username'] for profile in response.data], ['a', 'b'])
+        self.assertGreater(response.data[0]['similarity'], response.data[1]['similarity'])
+
+        me.connections.add(a)
+        response = self.client.get('/api/profiles/me/recommendations/?mode=skills')
+        self.assertEqual([profile['username'] for profile in response.data], ['b'])
+
+    def test_unknown_mode(self):
+        create_profile('me')
+        self.assertEqual(self.client.get('/api/profiles/me/recommendations/?mode=random').status_code, 400)
+
+    def test_limit_must_be_positive(self):
+        create_profile('me')
+        response = self.client.get('/api/profiles/me/recommendations/', {'mode': 'skills', 'limit': '-1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConnectionGraphTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(ConnectionGraphTests, self).setUp()
+        graph.clear()
+        self.profiles = dict((name, create_profile(name * 2)) for name in 'abcdef')
+        for first, second in ['ab', 'bc', 'cd', 'ac']:
+            self.profiles[first].connections.add(self.profiles[second])
+
+    def test_distance(self):
+        distance = lambda first, second: self.client.get(
+            '/api/profiles/{}/distance/{}/'.format(first, second)).data['distance']
+        self.assertEqual(distance('aa', 'aa'), 0)
+        self.assertEqual(distance('aa', 'cc'), 1)
+        self.assertEqual(distance('aa', 'dd'), 2)
+        self.assertEqual(distance('bb', 'dd'), 2)
+        self.assertIsNone(distance('aa', 'ee'))
+
+        self.client.post('/api/connect/', {'first': 'dd', 'second': 'ee'}, format='json')
+        self.assertEqual(distance('aa', 'ee'), 3)
+        self.client.post('/api/deconnect/', {'first': 'cc', 'second': 'dd'}, format='json')
+        self.assertIsNone(distance('aa', 'ee'))
+
+    def test_mutual(self):
+        response = self.client.get('/api/profiles/aa/mutual/dd/')
+        self.assertEqual(response.data, {'count': 1, 'mutual': ['cc']})
+        self.profiles['b'].connections.add(self.profiles['d'])
+        self.assertEqual(self.client.get('/api/profiles/aa/mutual/dd/').data['mutual'], ['bb', 'cc'])
+        self.assertEqual(self.client.get('/api/profiles/aa/mutual/nobody/').status_code, 404)
+
+    def test_stale_graph_is_rebuilt_in_the_background(self):
+        graph.build()
+        graph.built -= settings.CONNECTION_GRAPH_MAX_AGE + 1
+        Profile.connections.through.objects.create(from_profile=self.profiles['e'], to_profile=self.profiles['f'])
+
+        with mock.patch('api.graph.Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertIsNone(graph.distance(self.profiles['e'].pk, self.profiles['f'].pk))
+        thread.assert_called_once_with(target=graph.rebuild, daemon=True)
+
+        graph.build()
+        self.assertEqual(graph.distance(self.profiles['e'].pk, self.profiles['f'].pk), 1)
+
+    def test_changes_made_while_building_are_kept(self):
+        load = ConnectionGraph.load
+
+        def connect_while_loading(fresh, edges):
+            load(fresh, edges)
+            self.profiles['e'].connections.add(self.profiles['f'])
+
+        with mock.patch.object(ConnectionGraph, 'load', connect_while_loading):
+            graph.build()
+        self.assertEqual(graph.neighbours(self.profiles['e'].pk), {self.profiles['f'].pk})
+
+    def test_compaction_keeps_edges(self):
+        small = ConnectionGraph()
+        small.load([(1, 2), (2, 1)])
+        small.patch(3, [1, 2], True)
+        small.patch(2, [1], False)
+        small.compact()
+        self.assertEqual(list(small.ids), [1, 2, 3])
+        self.assertEqual(small.neighbours(1), {3})
+        self.assertEqual(small.neighbours(3), {1, 2})
+        self.assertEqual(small.overlay, 0)
+
+
+class FailingEmailBackend(BaseEmailBackend, ):
+
+    def send_messages(self, email_messages):
+        raise IOError('Mail server unavailable')
+
+
+class OutboxTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(OutboxTests, self).setUp()
+        self.matt = create_profile('matt', preferred_name='Matt')
+
+    def send_queued_mail(self):
+        call_command('send_queued_mail', stdout=StringIO())
+
+    def test_invite_is_queued(self):
+        self.client.force_authenticate(self.matt.user)
+        response = self.client.post('/api/send-invite/', {'email': 'david@david.io', 'link': 'http://cvconnect.com'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['david@david.io'])
+        self.assertIn('invited to CVConnect by Matt', mail.outbox[0].body)
+
+        self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_password_reset_is_queued(self):
+        response = self.client.post('/api/forgot-password/', {'email': 'matt@cvconnect.com', 'link': 'http://reset'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.send_queued_mail()
+        self.assertEqual(mail.outbox[0].subject, 'Reset your CVConnect password!')
+
+    @override_settings(OUTBOX_RETRY_DELAY=60)
+    def test_failures_are_retried_with_backoff(self):
+        self.client.force_authenticate(self.matt.user)
+        self.client.post('/api/send-invite/', {'email': 'david@david.io', 'link': 'http://cvconnect.com'},
+                         format='json')
+
+        with self.settings(EMAIL_BACKEND='api.tests.FailingEmailBackend'):
+            self.send_queued_mail()
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('Mail server unavailable', email.last_error)
+        self.assertGreater(email.next_attempt, timezone.now())
+
+        # Not due yet
+        self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 0)
+
+        OutboxEmail.objects.update(next_attempt=timezone.now())
+        self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIsNotNone(OutboxEmail.objects.get().sent)
+
+
+class BulkInviteTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def test_bulk_invite(self):
+        matt = create_profile('matt', preferred_name='Matt')
+        create_profile('david')
+        self.client.force_authenticate(matt.user)
+
+        emails = ['a@cvconnect.io', 'not an email', 'A@cvconnect.io', 'David@cvconnect.com', 'b@cvconnect.io']
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/send-invites/', {'emails': emails, 'link': 'http://cvconnect.com'},
+                                        format='json')
+
+        self.assertEqual([(result['email'], result['result']) for result in response.data['results']], [
+            ('a@cvconnect.io', 'sent'),
+            ('not an email', 'invalid'),
+            ('A@cvconnect.io', 'duplicate'),
+            ('David@cvconnect.com', 'already registered'),
+            ('b@cvconnect.io', 'sent'),
+        ])
+
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), ['a@cvconnect.io', 'b@cvconnect.io'])
+
+    def test_repeated_addresses(self):
+        matt = create_profile('matt')
+        # Registered twice with the same address in different case
+        create_profile('david')
+        create_profile('dave')
+        User.objects.filter(username='dave').update(email='DAVID@cvconnect.com')
+        self.client.force_authenticate(matt.user)
+
+        emails = ['new@example.com', 'new@example.com', 'bad', 'bad', 'david@cvconnect.com']
+        response = self.client.post('/api/send-invites/', {'emails': emails, 'link': 'http://cvconnect.com'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['result'] for result in response.data['results']],
+                         ['sent', 'duplicate', 'invalid', 'duplicate', 'already registered'])
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    @override_settings(MAX_BULK_INVITES=1)
+    def test_bulk_invite_limit(self):
+        matt = create_profile('matt')
+        self.client.force_authenticate(matt.user)
+        response = self.client.post('/api/send-invites/', {'emails': ['a@cvconnect.io', 'b@cvconnect.io'],
+                                                           'link': 'http://cvconnect.com'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(OutboxEmail.objects.count(), 0)
+
+
+class ProfileImageUploadTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(ProfileImageUploadTests, self).setUp()
+        self.media_root = tempfile.mkdtemp()
+        storage = override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+                                    MEDIA_ROOT=self.media_root)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def test_multipart_upload_creates_thumbnails(self):
+        matt = create_profile('matt')
+        photo = BytesIO()
+        Image.new('RGB', (2000, 1500), 'red').save(photo, 'JPEG')
+        photo.name = 'photo.jpg'
+        photo.seek(0)
+
+        response = self.client.post('/api/profiles/matt/image/', {'image': photo}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+        image = Profile.objects.get(pk=matt.pk).image
+        for size, expected in [(512, (512, 384)), (128, (128, 96)), (64, (64, 48))]:
+            thumbnail = getattr(image, 'thumbnail_{}'.format(size))
+            self.assertEqual((thumbnail.width, thumbnail.height), expected)
+            self.assertTrue(response.data['thumbnail_{}'.format(size)].endswith(thumbnail.url))
+
+        self.assertEqual(self.client.get('/api/search/matt/').data['results'][0]['image'], image.thumbnail_64.url)
+
+    @override_settings(MAX_IMAGE_PIXELS=1000 * 1000)
+    def test_pixel_limit(self):
+        create_profile('matt')
+        for image_format, status in [('PNG', 400), ('JPEG', 200)]:
+            photo = BytesIO()
+            Image.new('RGB', (2000, 1500), 'red').save(photo, image_format)
+            photo.name = 'photo.' + image_format.lower()
+            photo.seek(0)
+            response = self.client.post('/api/profiles/matt/image/', {'image': photo}, format='multipart')
+            self.assertEqual(response.status_code, status)
+
+    def test_invalid_upload(self):
+        create_profile('matt')
+        text = BytesIO(b'not an image')
+        text.name = 'photo.jpg'
+        response = self.client.post('/api/profiles/matt/image/', {'image': text}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProfileCacheTests(APITestCase, ):
+
+    def setUp(self):
+        super(ProfileCacheTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.david = create_profile('david')
+        self.matt.connections.add(self.david)
+
+    def test_detail_is_cached(self):
+        self.assertEqual(self.client.get('/api/profiles/matt/').data['connections'], ['david'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/profiles/matt/').data['connections'], ['david'])
+
+    def test_connection_list_is_cached(self):
+        self.client.get('/api/profiles/matt/connections/')
+        with self.assertNumQueries(1):
+            self.assertEqual([profile['username'] for profile in self.client.get('/api/profiles/matt/connections/').data],
+                             ['david'])
+
+    def test_invalidation(self):
+        get = lambda username: self.client.get('/api/profiles/{}/'.format(username)).data
+        self.assertEqual(get('matt')['current_position'], 'Not Employed')
+
+        job = EmploymentDescription.objects.create(profile=self.matt, location='Sydney', employer='Nozama',
+                                                   role='Engineer', start_date=date(2015, 1, 1))
+        self.assertEqual(get('matt')['current_position'], 'Engineer')
+        job.delete()
+        self.assertEqual(get('matt')['current_position'], 'Not Employed')
+
+        self.matt.full_name = 'Matt Egan'
+        self.matt.save()
+        self.assertEqual(get('matt')['full_name'], 'Matt Egan')
+
+        self.assertEqual(get('david')['connections'], ['matt'])
+        self.matt.user.username = 'matthew'
+        self.matt.user.save()
+        self.assertEqual(get('david')['connections'], ['matthew'])
+
+        self.david.connections.remove(self.matt)
+        self.assertEqual(get('matthew')['connections'], [])
+        self.assertEqual(get('david')['connections'], [])
+
+
+class ProfileFullTests(APITestCase, ):
+
+    def setUp(self):
+        super(ProfileFullTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.david = create_profile('david')
+        self.matt.connections.add(self.david)
+        Skill.objects.create(profile=self.matt, name='Python', proficiency=5)
+        EducationDescription.objects.create(profile=self.matt, institution='UNSW', degree='BE',
+                                            date_started=date(2010, 1, 1))
+        EmploymentDescription.objects.create(profile=self.matt, location='Sydney', employer='Nozama',
+                                             role='Engineer', start_date=date(2015, 1, 1))
+        FeedPost.objects.create(user=self.matt.user, text='Hello')
+
+    def test_every_section(self):
+        response = self.client.get('/api/profiles/matt/full/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(list(data), ['profile', 'image', 'skills', 'education', 'employment', 'connections',
+                                      'feedposts'])
+        self.assertEqual(data['profile'], self.client.get('/api/profiles/matt/').data)
+        self.assertEqual(data['image'], self.client.get('/api/profiles/matt/image/').data)
+        self.assertEqual(data['skills'], self.client.get('/api/profiles/matt/skills/').data)
+        self.assertEqual(data['education'], self.client.get('/api/profiles/matt/education/').data)
+        self.assertEqual(data['employment'], self.client.get('/api/profiles/matt/employment/').data)
+        self.assertEqual(data['connections'], self.client.get('/api/profiles/matt/connections/').data)
+        self.assertEqual(data['feedposts'], self.client.get('/api/profiles/matt/feedposts/').data['results'])
+
+    def test_include(self):
+        response = self.client.get('/api/profiles/matt/full/', {'include': 'skills,connections'})
+        self.assertEqual(list(response.data), ['profile', 'skills', 'connections'])
+        self.assertEqual([connection['username'] for connection in response.data['connections']], ['david'])
+
+        self.assertEqual(self.client.get('/api/profiles/matt/full/', {'include': 'jobs'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/profiles/nobody/full/').status_code, 404)
+
+    def test_query_count_does_not_grow_with_sections(self):
+        for i in range(5):
+            self.matt.connections.add(create_profile('user{}'.format(i)))
+            Skill.objects.create(profile=self.matt, name='Skill {}'.format(i), proficiency=1)
+            FeedPost.objects.create(user=self.matt.user, text=str(i))
+
+        self.client.get('/api/profiles/matt/full/')
+        # One query for the profile, three for its prefetched rows, one each
+        # for the connection ids and the feed posts
+        with self.assertNumQueries(6):
+            self.client.get('/api/profiles/matt/full/')
+
+
+class SparseFieldsTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(SparseFieldsTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+        for i in range(3):
+            profile = create_profile('user{}'.format(i))
+            self.matt.connections.add(profile)
+            Skill.objects.create(profile=profile, name='Python', proficiency=5)
+            EmploymentDescription.objects.create(profile=profile, location='Sydney', employer='Nozama',
+                                                 role='Engineer', start_date=date(2015, 1, 1))
+            JobApplication.objects.create(job_posting=self.job, profile=profile)
+            FeedPost.objects.create(user=self.matt.user, text=str(i))
+
+    def test_updated_is_only_output_when_asked_for(self):
+        self.assertNotIn('updated', self.client.get('/api/profiles/matt/').data)
+        self.assertNotIn('updated', self.client.get('/api/profiles/').data['results'][0])
+        self.assertIn('updated', self.client.get('/api/profiles/', {'fields': 'username,updated'}).data['results'][0])
+
+    def test_profile_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/profiles/', {'fields': 'username,full_name,image'})
+        self.assertEqual(response.data['results'][0], {'username': 'user2', 'full_name': 'user2', 'image': None})
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profiles/', {'fields': 'full_name'})
+        self.assertEqual([profile['full_name'] for profile in response.data['results']],
+                         ['user2', 'user1', 'user0', 'matt'])
+
+    def test_job_application_list(self):
+        url = '/api/jobs/{}/applications/'.format(self.job.pk)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'fields': 'username,status'})
+        self.assertEqual(response.data['results'][0], {'username': 'user2', 'status': 'Pending'})
+
+        response = self.client.get(url, {'fields': 'username,current_position,skills'})
+        self.assertEqual(response.data['results'][0], {'username': 'user2', 'current_position': 'Engineer',
+                                                       'skills': 'Python'})
+
+    def test_feed_posts(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profiles/matt/feedposts/', {'fields': 'text'})
+        self.assertEqual(response.data['results'], [{'text': '2'}, {'text': '1'}, {'text': '0'}])
+
+    def test_cached_views(self):
+        self.assertEqual(self.client.get('/api/profiles/matt/', {'fields': 'username,connections'}).data,
+                         {'username': 'matt', 'connections': ['user0', 'user1', 'user2']})
+        self.assertEqual(self.client.get('/api/profiles/matt/connections/', {'fields': 'username'}).data,
+                         [{'username': 'user0'}, {'username': 'user1'}, {'username': 'user2'}])
+
+    def test_writes_are_not_pruned(self):
+        response = self.client.post('/api/profiles/matt/skills/?fields=name',
+                                    {'profile': self.matt.pk, 'name': 'Go', 'proficiency': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['proficiency'], 3)
+
+
+class StreamingListTests(APITestCase, ):
+
+    def setUp(self):
+        super(StreamingListTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+
+    def apply(self, count):
+        for i in range(count):
+            profile = create_profile('user{}'.format(Profile.objects.count()))
+            Skill.objects.create(profile=profile, name='Python', proficiency=5)
+            JobApplication.objects.create(job_posting=self.job, profile=profile)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf8')
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_ndjson(self):
+        self.apply(4)
+        response = self.client.get('/api/profiles/', {'format': 'ndjson', 'fields': 'username'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(self.read(response).splitlines(), ['{"username":"user4"}', '{"username":"user3"}',
+                                                            '{"username":"user2"}', '{"username":"user1"}',
+                                                            '{"username":"matt"}'])
+
+        response = self.client.get('/api/profiles/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(len(self.read(response).splitlines()), 5)
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_json_array(self):
+        url = '/api/jobs/{}/applications/'.format(self.job.pk)
+        self.assertEqual(self.read(self.client.get(url, {'format': 'json-stream'})), '[]')
+
+        self.apply(3)
+        streamed = json.loads(self.read(self.client.get(url, {'format': 'json-stream'})))
+        self.assertEqual(streamed, self.client.get(url, {'page_size': 10}).data['results'])
+
+    def test_queries_are_per_chunk(self):
+        url = '/api/jobs/{}/applications/'.format(self.job.pk)
+
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                self.read(self.client.get(url, {'format': 'ndjson'}))
+            return len(queries)
+
+        self.apply(2)
+        few = count()
+        self.apply(10)
+        self.assertEqual(count(), few)
+
+
+class ApplicantExportTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(ApplicantExportTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+        self.url = '/api/jobs/{}/applications/export/'.format(self.job.pk)
+        self.client.force_authenticate(self.matt.user)
+
+    def apply(self, username, skills=(), **employment):
+        profile = create_profile(username, full_name=username.title())
+        for name in skills:
+            Skill.objects.create(profile=profile, name=name, proficiency=3)
+        if employment:
+            EmploymentDescription.objects.create(profile=profile, location='Sydney', start_date=date(2015, 1, 1),
+                                                 **employment)
+        return JobApplication.objects.create(job_posting=self.job, profile=profile)
+
+    def export(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf8')
+
+    def test_export(self):
+        self.apply('david', skills=['Python', 'Go'], role='Engineer', employer='Nozama')
+        self.apply('sarah')
+        application = self.apply('jane', skills=['Rust'])
+        application.status = 'Accepted'
+        application.save()
+        JobApplication.objects.create(job_posting=JobPosting.objects.create(recruiter=self.matt.user),
+                                      profile=self.matt)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(self.export().splitlines(), [
+            'full_name,username,current_position,current_company,skills,status',
+            'David,david,Engineer,Nozama,"Python, Go",Pending',
+            'Sarah,sarah,Not Employed,Not Employed,,Pending',
+            'Jane,jane,Not Employed,Not Employed,Rust,Accepted',
+        ])
+
+    def test_formulas_are_escaped(self):
+        self.apply('david', skills=['=HYPERLINK("http://evil.example")'], role='@SUM(A1)', employer='-1+2')
+        self.assertEqual(self.export().splitlines()[1],
+                         'David,david,\'@SUM(A1),\'-1+2,"\'=HYPERLINK(""http://evil.example"")",Pending')
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_query_count_is_constant(self):
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                self.export()
+            return len(queries)
+
+        for i in range(3):
+            self.apply('user{}'.format(i), skills=['Python'], role='Engineer', employer='Nozama')
+        few = count()
+        # One for the job posting and one each for the applications, employment and skills
+        self.assertEqual(few, 4)
+        for i in range(3, 20):
+            self.apply('user{}'.format(i), skills=['Python'], role='Engineer', employer='Nozama')
+        self.assertEqual(count(), few)
+        self.assertEqual(len(self.export().splitlines()), 21)
+
+    def test_only_the_recruiter_can_export(self):
+        self.client.force_authenticate(create_profile('david').user)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProfileCacheCommitTests(TransactionTestCase, ):
+
+    def test_entries_are_deleted_on_commit(self):
+        cache.clear()
+        matt = create_profile('matt')
+        profile_cache.get_profile(matt.pk)
+
+        with transaction.atomic():
+            Skill.objects.create(profile=matt, name='Python', proficiency=5)
+            self.assertIsNotNone(cache.get(profile_cache.cache_key(matt.pk)))
+        self.assertIsNone(cache.get(profile_cache.cache_key(matt.pk)))
+
+        profile_cache.get_profile(matt.pk)
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Skill.objects.create(profile=matt, name='Go', proficiency=5)
+                raise ValueError
+        self.assertIsNotNone(cache.get(profile_cache.cache_key(matt.pk)))
+
+
+class ConnectionGraphCommitTests(TransactionTestCase, ):
+
+    def test_changes_are_applied_on_commit(self):
+        first, second = create_profile('first'), create_profile('second')
+        graph.clear()
+        graph.build()
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                first.connections.add(second)
+                raise ValueError
+        self.assertEqual(graph.neighbours(first.pk), set())
+
+        with transaction.atomic():
+            first.connections.add(second)
+            self.assertEqual(graph.neighbours(first.pk), set())
+        self.assertEqual(graph.neighbours(first.pk), {second.pk})
+        self.assertEqual(graph.neighbours(second.pk), {first.pk})
+
+        first.connections.clear()
+        self.assertEqual(graph.neighbours(second.pk), set())
+
+
+class BulkEditCommitTests(TransactionTestCase, ):
+
+    def test_indexes_are_updated_on_commit(self):
+        matt = Profile.objects.select_related('user').get(pk=create_profile('matt').pk)
+        autocomplete_index.clear()
+        autocomplete_index.build()
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                apply_changes(matt, Skill, [Skill(profile=matt, name='Go', proficiency=4)], [], [])
+                raise ValueError
+        self.assertEqual(autocomplete_index.complete('go', 10), [])
+
+        with transaction.atomic():
+            apply_changes(matt, Skill, [Skill(profile=matt, name='Go', proficiency=4)], [], [])
+            self.assertEqual(autocomplete_index.complete('go', 10), [])
+        self.assertEqual(autocomplete_index.complete('go', 10), [('Go', 'skills')])
+        self.assertTrue(SearchEntry.objects.filter(subtype='skills', match='Go').exists())
+
+
+class ConditionalGetTests(APITestCase, ):
+
+    def setUp(self):
+        super(ConditionalGetTests, self).setUp()
+        self.matt = create_profile('matt')
+
+    def assertNotModified(self, url, response):
+        with self.assertNumQueries(1):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_profile_detail(self):
+        response = self.client.get('/api/profiles/matt/')
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertNotModified('/api/profiles/matt/', response)
+
+        EducationDescription.objects.create(profile=self.matt, institution='UNSW', degree='BE',
+                                            date_started=date(2010, 1, 1))
+        changed = self.client.get('/api/profiles/matt/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['current_edu'], 'UNSW')
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_job_posting_detail(self):
+        job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+        url = '/api/jobs/{}/'.format(job.pk)
+        response = self.client.get(url)
+        self.assertNotModified(url, response)
+
+        job.position = 'Senior Developer'
+        job.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_job_posting_age_changes_the_etag(self):
+        job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+        url = '/api/jobs/{}/'.format(job.pk)
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        JobPosting.objects.filter(pk=job.pk).update(created=job.created - timedelta(days=3))
+        aged = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(aged.status_code, 200)
+        self.assertEqual(aged.data['created'], '3\xa0days')
+
+    def test_etag_varies_with_fields_and_media_type(self):
+        response = self.client.get('/api/profiles/matt/')
+        sparse = self.client.get('/api/profiles/matt/', {'fields': 'username'},
+                                 HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(sparse.status_code, 200)
+        self.assertEqual(sparse.data, {'username': 'matt'})
+        self.assertNotEqual(sparse['ETag'], response['ETag'])
+        self.assertEqual(self.client.get('/api/profiles/matt/?fields=username',
+                                         HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 304)
+
+        html = self.client.get('/api/profiles/matt/', HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(html.status_code, 200)
+        self.assertNotEqual(html['ETag'], response['ETag'])
+
+    def test_skill_list(self):
+        Skill.objects.create(profile=self.matt, name='Python', proficiency=5)
+        response = self.client.get('/api/profiles/matt/skills/')
+        self.assertNotModified('/api/profiles/matt/skills/', response)
+
+        Skill.objects.get().delete()
+        changed = self.client.get('/api/profiles/matt/skills/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data, [])
+
+
+class TimelineTests(APITestCase, ):
+
+    def setUp(self):
+        super(TimelineTests, self).setUp()
+        graph.clear()
+        self.profiles = dict((name, create_profile(name * 2)) for name in 'abcd')
+        for first, second in ['ab', 'ac', 'bc']:
+            self.profiles[first].connections.add(self.profiles[second])
+
+    def post(self, name, text):
+        return FeedPost.objects.create(user=self.profiles[name].user, text=text)
+
+    def timeline(self, name, **params):
+        response = self.client.get('/api/profiles/{}/timeline/'.format(name * 2), params)
+        return [post['text'] for post in response.data['results']], response.data['next']
+
+    def test_fan_out(self):
+        self.post('a', 'first')
+        self.post('b', 'second')
+        self.post('d', 'unconnected')
+        self.assertEqual(TimelineEntry.objects.count(), 7)
+
+        self.assertEqual(self.timeline('c')[0], ['second', 'first'])
+        self.assertEqual(self.timeline('d')[0], ['unconnected'])
+        self.assertEqual(self.client.get('/api/profiles/nobody/timeline/').status_code, 404)
+
+    def test_paging(self):
+        for i in range(5):
+            self.post('a', str(i))
+
+        texts, next_link = self.timeline('b', page_size=2)
+        self.assertEqual(texts, ['4', '3'])
+        seen = texts
+        while next_link:
+            response = self.client.get(next_link)
+            seen = seen + [post['text'] for post in response.data['results']]
+            next_link = response.data['next']
+        self.assertEqual(seen, ['4', '3', '2', '1', '0'])
+
+    def test_busy_authors_are_pulled(self):
+        with self.settings(TIMELINE_FANOUT_LIMIT=1):
+            self.post('a', 'busy')
+            self.post('d', 'quiet')
+            self.assertFalse(TimelineEntry.objects.filter(user=self.profiles['b'].user).exists())
+            self.assertEqual(self.timeline('b')[0], ['busy'])
+
+    def test_pulled_authors_do_not_depend_on_the_connection_graph(self):
+        # A worker's copy of the graph can be out of date
+        graph.load([])
+        with self.settings(TIMELINE_FANOUT_LIMIT=1):
+            self.post('a', 'busy')
+            self.assertEqual(self.timeline('b')[0], ['busy'])
+
+    def test_connection_counts(self):
+        counts = lambda: dict((name, Profile.objects.get(pk=profile.pk).connection_count)
+                              for name, profile in self.profiles.items())
+        self.assertEqual(counts(), {'a': 2, 'b': 2, 'c': 2, 'd': 0})
+        self.profiles['d'].connections.add(self.profiles['a'], self.profiles['b'])
+        self.profiles['a'].connections.remove(self.profiles['b'])
+        self.assertEqual(counts(), {'a': 2, 'b': 2, 'c': 2, 'd': 2})
+        self.profiles['c'].connections.clear()
+        self.assertEqual(counts(), {'a': 1, 'b': 1, 'c': 0, 'd': 2})
+
+    def test_pulled_authors_are_one_lookup(self):
+        with self.settings(TIMELINE_FANOUT_LIMIT=1):
+            with self.assertNumQueries(1):
+                self.assertEqual(sorted(pulled_user_ids(self.profiles['b'].user_id)),
+                                 sorted([self.profiles['a'].user_id, self.profiles['c'].user_id]))
+
+    def test_disconnecting_removes_posts(self):
+        self.post('a', 'first')
+        self.profiles['a'].connections.remove(self.profiles['b'])
+        self.assertEqual(self.timeline('b')[0], [])
+        self.assertEqual(self.timeline('c')[0], ['first'])
+
+
+class FeedPostListTests(APITestCase, ):
+
+    def setUp(self):
+        super(FeedPostListTests, self).setUp()
+        self.matt = create_profile('matt', full_name='Matt Smith')
+        for i in range(12):
+            FeedPost.objects.create(user=self.matt.user, text=str(i))
+
+    def test_paging(self):
+        seen = []
+        url = '/api/profiles/matt/feedposts/?page_size=5'
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            seen.extend(post['text'] for post in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [str(i) for i in reversed(range(12))])
+
+        post = response.data['results'][0]
+        self.assertEqual(post['user'], 'matt')
+        self.assertEqual(post['full_name'], 'Matt Smith')
+        self.assertIsNone(post['image'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/profiles/matt/feedposts/?cursor=nonsense').status_code, 404)
+
+
+class InlineExecutor(Executor, ):
+    """
+    Runs calls straight away on the calling thread, which can see the
+    in-memory test database
+    """
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class SharedConnectionExecutor(Executor, ):
+    """
+    Runs calls on a new thread that shares the calling thread's connection
+    to the in-memory test database
+    """
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        shared = connections['default']
+        shared.allow_thread_sharing = True
+
+        def run():
+            connections['default'] = shared
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        Thread(target=run).start()
+        return future
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   EVENTS_KEEPALIVE=1)
+class EventStreamTests(TransactionTestCase, ):
+    """
+    Events are published once transactions commit, so these tests commit
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.matt = create_profile('matt')
+        self.jane = create_profile('jane')
+        self.matt.connections.add(self.jane)
+        self.token = Token.objects.create(user=self.jane.user).key
+
+    def test_stream(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 401)
+
+        response = self.client.get('/api/events/?token=' + self.token)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 1000\n\n')
+
+        post = FeedPost.objects.create(user=self.matt.user, text='Hello')
+        self.assertEqual(next(stream),
+                         'event: feedpost\ndata: {{"id": {}, "user": "matt"}}\n\n'.format(post.pk).encode())
+
+        job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+        application = JobApplication.objects.create(job_posting=job, profile=self.jane)
+        self.assertEqual(next(stream), b': keepalive\n\n')
+
+        application = JobApplication.objects.get()
+        application.status = 'Accepted'
+        application.save()
+        self.assertIn(b'"status": "Accepted"', next(stream))
+        response.close()
+        self.assertEqual(get_broker().subscriptions, set())
+
+    def test_stream_follows_new_connections(self):
+        response = self.client.get('/api/events/?token=' + self.token)
+        stream = iter(response.streaming_content)
+        next(stream)
+
+        bob = create_profile('bob')
+        bob.connections.add(self.jane)
+        self.matt.connections.remove(self.jane)
+        FeedPost.objects.create(user=self.matt.user, text='Gone')
+        post = FeedPost.objects.create(user=bob.user, text='Hello')
+        self.assertEqual(next(stream),
+                         'event: feedpost\ndata: {{"id": {}, "user": "bob"}}\n\n'.format(post.pk).encode())
+        response.close()
+
+    def asgi(self, path, query_string=b'', messages=None, headers=()):
+        """
+        Runs a GET request through the ASGI application, returning what it
+        sent. Once it has sent the given number of messages the client
+        disconnects.
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        # WsgiToAsgi runs the WSGI application on the default executor
+        loop.set_default_executor(SharedConnectionExecutor())
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            if sent:
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+            if messages is not None and len(sent) == messages:
+                disconnect.set()
+
+        scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': path,
+                 'query_string': query_string, 'headers': list(headers), 'server': ('testserver', 80)}
+        try:
+            with mock.patch('cvconnect_backend.asgi.executor', InlineExecutor()):
+                loop.run_until_complete(asyncio.wait_for(asgi_application(scope, receive, send), 10))
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+        return sent
+
+    def test_asgi(self):
+        sent = self.asgi('/api/profiles/matt/')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'"username":"matt"', b''.join(message.get('body', b'') for message in sent))
+
+        # Posts made before the stream opens are not sent
+        FeedPost.objects.create(user=self.matt.user, text='Early')
+        sent = self.asgi('/api/events/', b'token=' + self.token.encode(), messages=3)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(sent[1]['body'], b'retry: 1000\n\n')
+        self.assertEqual(sent[2]['body'], b': keepalive\n\n')
+        self.assertEqual(get_broker().subscriptions, set())
+
+        self.assertEqual(self.asgi('/api/events/')[0]['status'], 401)
+
+    def test_asgi_cors(self):
+        origin = [(b'origin', b'https://cvconnect.example')]
+        sent = self.asgi('/api/events/', b'token=' + self.token.encode(), messages=2, headers=origin)
+        self.assertIn((b'access-control-allow-origin', b'*'), sent[0]['headers'])
+        self.assertIn((b'access-control-allow-origin', b'*'), self.asgi('/api/events/', headers=origin)[0]['headers'])
+
+        # corsheaders reads its settings as it is imported
+        with mock.patch('corsheaders.defaults.CORS_ALLOW_CREDENTIALS', True):
+            headers = self.asgi('/api/events/', headers=origin)[0]['headers']
+        self.assertIn((b'access-control-allow-origin', b'https://cvconnect.example'), headers)
+        self.assertIn((b'access-control-allow-credentials', b'true'), headers)
+
+        self.assertNotIn(b'access-control-allow-origin', dict(self.asgi('/api/events/')[0]['headers']))
+
+
+# The tables behind the hot lookups, which must always be read through an index
+HOT_TABLES = {'auth_user', 'api_profile', 'api_jobapplication', 'api_feedpost', 'api_forgottenpasswordtoken',
+              'api_employmentdescription'}
+
+
+def sequential_scans(sql):
+    """
+    Returns the tables the database plans to read in full to run sql. On
+    PostgreSQL sequential scans are disabled first, so one only appears
+    when there is no index it could use instead.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            nodes = [cursor.fetchone()[0][0]['Plan']]
+            scans = set()
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    scans.add(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return scans
+
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return set(match.group(2) for match in
+                   (re.match(r'SCAN (TABLE )?(\w+)', row[-1]) for row in cursor.fetchall()) if match)
+
+
+class QueryPlanTests(APITestCase, ):
+    """
+    Runs EXPLAIN on every query behind the hot endpoints against a few
+    thousand rows, failing if any of them reads a hot table in full
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username='user{}'.format(i), email='user{}@cvconnect.com'.format(i))
+                                          for i in range(500)])
+        users = list(User.objects.order_by('id'))
+        Profile.objects.bulk_create([Profile(user=user, full_name=user.username, preferred_name=user.username,
+                                             country='Australia') for user in users])
+        profiles = list(Profile.objects.order_by('id'))
+
+        jobs = [JobPosting.objects.create(recruiter=users[i], company='Nozama', position='Developer')
+                for i in range(10)]
+        statuses = ['Pending', 'Accepted', 'Rejected']
+        JobApplication.objects.bulk_create([
+            JobApplication(job_posting=jobs[i % 10], profile=profile, status=statuses[i % 3])
+            for i, profile in enumerate(profiles)
+        ])
+        EmploymentDescription.objects.bulk_create([
+            EmploymentDescription(profile=profile, location='Sydney', employer='Nozama', role='Developer',
+                                  start_date=date(2010 + i % 5, 1, 1), end_date=date(2016, 1, 1) if i % 2 else None)
+            for profile in profiles for i in range(3)
+        ])
+        FeedPost.objects.bulk_create([FeedPost(user=users[i % 50], text=str(i)) for i in range(3000)])
+        ForgottenPasswordToken.objects.bulk_create([ForgottenPasswordToken(user=user, token=uuid4())
+                                                    for user in users])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        cls.job = jobs[0]
+        cls.token = ForgottenPasswordToken.objects.get(user=users[0]).token
+
+    def assertIndexed(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, content_type='application/json') \
+                if data is not None else getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400)
+
+        for query in queries:
+            if query['sql'].startswith(('SELECT', 'UPDATE', 'DELETE')):
+                scans = sequential_scans(query['sql']) & HOT_TABLES
+                self.assertFalse(scans, '{} {} scans {}: {}'.format(method.upper(), url, ', '.join(scans),
+                                                                   query['sql']))
+
+    def test_profile_detail(self):
+        self.assertIndexed('get', '/api/profiles/user1/')
+
+    def test_feed_posts(self):
+        self.assertIndexed('get', '/api/profiles/user1/feedposts/')
+
+    def test_profile_applications(self):
+        self.assertIndexed('get', '/api/profiles/user1/applications/')
+
+    def test_job_applications(self):
+        self.assertIndexed('get', '/api/jobs/{}/applications/?recruit=true'.format(self.job.pk))
+
+    def test_employment(self):
+        self.assertIndexed('get', '/api/profiles/user1/employment/')
+
+    def test_reset_password(self):
+        self.assertIndexed('post', '/api/reset-password/', '{{"token": "{}", "password": "secret"}}'.format(self.token))
+
+
+# The most queries a GET of each view may run, however many rows there are.
+# Every view in api/urls.py must be listed, views only written to have None.
+QUERY_BUDGETS = {
+    'UserList': ('/api/users/', 1),
+    'UserDetail': ('/api/users/matt/', 1),
+    'ChangePassword': None,
+    'ProfileList': ('/api/profiles/', 6),
+    'ProfileDetail': ('/api/profiles/matt/', 7),
+    'ProfileFull': ('/api/profiles/matt/full/', 12),
+    'ProfileRecommendations': ('/api/profiles/matt/recommendations/', 4),
+    'ProfileApplicationIDs': ('/api/profiles/matt/application_ids/', 1),
+    'JobPostingList': ('/api/jobs/', 1),
+    'JobPostingDetail': ('/api/jobs/{job}/', 3),
+    'JobApplicationList': ('/api/jobs/{job}/applications/', 6),
+    'JobApplicationDetail': ('/api/jobs/{job}/applications/{application}/', 6),
+    'JobApplicationExport': ('/api/jobs/{job}/applications/export/', 1),
+    'InviteViaEmail': None,
+    'BulkInviteViaEmail': None,
+    'ForgottenPasswordEmail': None,
+    'ResetPassword': None,
+    'Search': ('/api/search/user/', 1),
+    'Autocomplete': ('/api/autocomplete/?q=us', 5),
+    'RegisterConnection': None,
+    'DeleteConnection': None,
+    'ProfileImageList': ('/api/profiles/matt/image/', 7),
+    'ConnectionList': ('/api/profiles/matt/connections/', 7),
+    'MutualConnectionList': ('/api/profiles/matt/mutual/user1/', 2),
+    'ConnectionDistance': ('/api/profiles/matt/distance/user1/', 2),
+    'EducationDescriptionList': ('/api/profiles/matt/education/', 2),
+    'EducationDescriptionDetail': ('/api/profiles/matt/education/{education}/', 1),
+    'EmploymentDescriptionList': ('/api/profiles/matt/employment/', 2),
+    'EmploymentDescriptionDetail': ('/api/profiles/matt/employment/{employment}/', 1),
+    'SkillList': ('/api/profiles/matt/skills/', 2),
+    'SkillDetail': ('/api/profiles/matt/skills/{skill}/', 1),
+    'EducationDescriptionBulk': None,
+    'EmploymentDescriptionBulk': None,
+    'SkillBulk': None,
+    'ProfileApplicationList': ('/api/profiles/user1/applications/', 6),
+    'FeedPostList': ('/api/profiles/matt/feedposts/', 2),
+    'HomeTimeline': ('/api/profiles/matt/timeline/', 5),
+    'UserJobPostingsList': ('/api/profiles/matt/postings/', 1),
+    'EventStream': None,
+    'CompanyList': ('/api/companies/', 1),
+    'CompanyDetail': ('/api/companies/{company}/', 2),
+    'Metrics': ('/api/metrics/', 0),
+}
+
+
+class QueryBudgetTests(APITestCase, ):
+    """
+    Requests every view with 10 and then 1000 rows behind it, failing if
+    it runs more queries than its budget in QUERY_BUDGETS
+    """
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(QueryBudgetTests, self).setUp()
+        self.matt = create_profile('matt')
+        self.matt.user.is_staff = True
+        self.matt.user.save()
+        self.client.force_authenticate(self.matt.user)
+        self.job = JobPosting.objects.create(recruiter=self.matt.user, company='Nozama', position='Developer')
+        self.added = 0
+
+    def grow(self, rows):
+        """
+        Adds profiles connected to matt who applied for their job, along with
+        skills, education, employment, job postings, feed posts and companies
+        """
+        start, self.added = self.added, rows
+        users = User.objects.bulk_create([User(username='user{}'.format(i), email='user{}@cvconnect.com'.format(i))
+                                          for i in range(start, rows)])
+        users = User.objects.filter(username__in=[user.username for user in users])
+        profiles = Profile.objects.bulk_create([Profile(user=user, full_name=user.username,
+                                                        preferred_name=user.username, country='Australia')
+                                                for user in users])
+        profiles = list(Profile.objects.filter(user__in=users))
+
+        Connection = Profile.connections.through
+        Connection.objects.bulk_create(
+            [Connection(from_profile=self.matt, to_profile=profile) for profile in profiles] +
+            [Connection(from_profile=profile, to_profile=self.matt) for profile in profiles])
+        JobApplication.objects.bulk_create([JobApplication(job_posting=self.job, profile=profile)
+                                            for profile in profiles])
+        for model, fields in [
+            (Skill, {'name': 'Python', 'proficiency': 5}),
+            (EducationDescription, {'institution': 'UNSW', 'degree': 'BE', 'date_started': date(2010, 1, 1)}),
+            (EmploymentDescription, {'location': 'Sydney', 'employer': 'Nozama', 'role': 'Developer',
+                                     'start_date': date(2010, 1, 1)}),
+        ]:
+            model.objects.bulk_create([model(profile=profile, **fields) for profile in [self.matt] + profiles])
+            model.objects.bulk_create([model(profile=self.matt, **fields) for profile in profiles])
+        JobPosting.objects.bulk_create([JobPosting(recruiter=self.matt.user, position=str(i))
+                                        for i in range(start, rows)])
+        FeedPost.objects.bulk_create([FeedPost(user=self.matt.user, text=str(i)) for i in range(start, rows)])
+        TimelineEntry.objects.bulk_create([TimelineEntry(user=self.matt.user, post=post, created=post.created)
+                                           for post in FeedPost.objects.filter(timelineentry=None)])
+        Company.objects.bulk_create([Company(name=str(i), description='', industry='') for i in range(start, rows)])
+        if not start:
+            CompanyManager.objects.create(profile=self.matt, company=Company.objects.first())
+
+    def query_counts(self):
+        ids = {
+            'job': self.job.pk,
+            'application': JobApplication.objects.first().pk,
+            'education': EducationDescription.objects.filter(profile=self.matt).first().pk,
+            'employment': EmploymentDescription.objects.filter(profile=self.matt).first().pk,
+            'skill': Skill.objects.filter(profile=self.matt).first().pk,
+            'company': Company.objects.first().pk,
+        }
+
+        counts = {}
+        for view, budget in QUERY_BUDGETS.items():
+            if budget is None:
+                continue
+            cache.clear()
+            graph.clear()
+            autocomplete_index.clear()
+
+            response = self.client.get(budget[0].format(**ids))
+            self.assertEqual(response.status_code, 200, view)
+            counts[view] = int(response['X-Query-Count'])
+        return counts
+
+    def test_every_view_has_a_budget(self):
+        views = set(pattern.callback.view_class.__name__ for pattern in urlpatterns)
+        self.assertEqual(views, set(QUERY_BUDGETS))
+
+    def test_budgets(self):
+        for rows in [10, 1000]:
+            self.grow(rows)
+            for view, count in sorted(self.query_counts().items()):
+                self.assertLessEqual(count, QUERY_BUDGETS[view][1],
+                                     '{} ran {} queries with {} rows'.format(view, count, rows))
+
+    @override_settings(QUERY_COUNT_HEADERS=False)
+    def test_logged_without_headers(self):
+        logged = len(connection.queries_log)
+        with self.assertLogs('api.queries', 'INFO') as logs:
+            response = self.client.get('/api/users/matt/')
+        self.assertFalse(response.has_header('X-Query-Count'))
+        self.assertIn('"queries": 1', logs.output[0])
+        # Counted without keeping the SQL
+        self.assertEqual(len(connection.queries_log), logged)
+        self.assertIn('"view": "api:api.views.UserDetail"', logs.output[0])
+
+
+class BenchmarkTests(APITestCase, ):
+
+    def test_generate_and_benchmark(self):
+        call_command('generate_data', users=60, seed=1, stdout=StringIO())
+        self.assertEqual(Profile.objects.count(), 60)
+        self.assertTrue(FeedPost.objects.exists())
+        self.assertEqual(TimelineEntry.objects.filter(user=F('post__user')).count(), FeedPost.objects.count())
+
+        first = list(Skill.objects.order_by('id').values_list('profile__user__username', 'name'))
+        with transaction.atomic():
+            savepoint = transaction.savepoint()
+            call_command('generate_data', users=60, seed=1, prefix='again', stdout=StringIO())
+            again = list(Skill.objects.filter(profile__user__username__startswith='again').order_by('id')
+                         .values_list('profile__user__username', 'name'))
+            transaction.savepoint_rollback(savepoint)
+        self.assertEqual([name for username, name in first], [name for username, name in again])
+
+        output = tempfile.NamedTemporaryFile(suffix='.json')
+        self.addCleanup(output.close)
+        stdout = StringIO()
+        call_command('benchmark', repeat=2, output=output.name, stdout=stdout)
+        self.assertIn('ConnectionList', stdout.getvalue())
+        self.assertIn('ChangePassword', stdout.getvalue().splitlines()[0])
+
+        stdout = StringIO()
+        call_command('benchmark', repeat=2, baseline=output.name, route=['ProfileDetail'], stdout=stdout)
+        row = stdout.getvalue().splitlines()[-1]
+        self.assertTrue(row.startswith('ProfileDetail'))
+        self.assertEqual(row.split()[1], '200')
+        self.assertIn('queries +0', row)
+
+
+class ProfilingTests(APITestCase, ):
+
+    def setUp(self):
+        super(ProfilingTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.matt = create_profile('matt')
+        self.token = Token.objects.create(user=self.matt.user).key
+
+    def test_staff_requests(self):
+        with self.settings(PROFILING_DIR=self.directory):
+            response = self.client.get('/api/profiles/matt/', HTTP_X_PROFILE='1',
+                                       HTTP_AUTHORIZATION='Token ' + self.token)
+            self.assertFalse(response.has_header('X-Profile-Id'))
+
+            self.matt.user.is_staff = True
+            self.matt.user.save()
+            response = self.client.get('/api/profiles/matt/', HTTP_X_PROFILE='1',
+                                       HTTP_AUTHORIZATION='Token ' + self.token)
+            capture_id = response['X-Profile-Id']
+
+            stdout = StringIO()
+            call_command('request_profiles', stdout=stdout)
+            self.assertIn(capture_id, stdout.getvalue())
+            self.assertIn('GET /api/profiles/matt/', stdout.getvalue())
+
+            stdout = StringIO()
+            call_command('request_profiles', capture_id, limit=5, stdout=stdout)
+            self.assertIn('(api:api.views.ProfileDetail) returned 200', stdout.getvalue())
+            self.assertIn('function calls', stdout.getvalue())
+            self.assertIn('FROM "api_profile"', stdout.getvalue())
+
+    def test_sampling(self):
+        with self.settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=1.0):
+            response = self.client.get('/api/users/matt/')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_query_string_is_not_recorded(self):
+        with self.settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=1.0):
+            self.client.get('/api/users/matt/?token=secret')
+        name = next(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        with open(os.path.join(self.directory, name)) as f:
+            self.assertEqual(json.load(f)['path'], '/api/users/matt/')
+
+    def test_old_captures_are_pruned(self):
+        with self.settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_CAPTURES=2):
+            for name in ('20000101T000000-a', '20000101T000000-b'):
+                for extension in ('json', 'pstats'):
+                    open(os.path.join(self.directory, '{}.{}'.format(name, extension)), 'w').close()
+            self.client.get('/api/users/matt/')
+        names = sorted(os.listdir(self.directory))
+        self.assertEqual(len(names), 4)
+        self.assertEqual(names[:2], ['20000101T000000-b.json', '20000101T000000-b.pstats'])
+
+
+class MetricsTests(APITestCase, ):
+    client_class = APIClient
+
+    def sample(self, text, name, **labels):
+        pattern = r'^{}\{{{}\}} (\S+)$'.format(name, ','.join(
+            '{}="{}"'.format(key, re.escape(value)) for key, value in sorted(labels.items())))
+        match = re.search(pattern, text, re.MULTILINE)
+        return float(match.group(1)) if match else 0.0
+
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        self.admin = User.objects.create_user('admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        self.client.force_authenticate(create_profile('matt').user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_metrics(self):
+        create_profile('matt')
+        before = self.client.get('/api/metrics/').content.decode()
+        self.client.get('/api/profiles/matt/')
+        # Served from the profile cache
+        self.client.get('/api/profiles/matt/image/')
+        self.client.get('/api/users/matt/')
+        after = self.client.get('/api/metrics/').content.decode()
+
+        view = 'api:api.views.ProfileDetail'
+        for name, labels in [
+            ('cvconnect_request_duration_seconds_count', {'view': view, 'method': 'GET'}),
+            ('cvconnect_request_db_duration_seconds_count', {'view': view}),
+            ('cvconnect_response_size_bytes_count', {'view': view}),
+            ('cvconnect_responses_total', {'view': view, 'status': '200'}),
+            ('cvconnect_serializer_duration_seconds_count', {'serializer': 'ProfileSerializer[]'}),
+            ('cvconnect_serializer_duration_seconds_count', {'serializer': 'UserSerializer'}),
+            ('cvconnect_cache_requests_total', {'cache': 'profile', 'result': 'miss'}),
+            ('cvconnect_cache_requests_total', {'cache': 'profile', 'result': 'hit'}),
+        ]:
+            self.assertEqual(self.sample(after, name, **labels) - self.sample(before, name, **labels), 1,
+                             name)
+
+    def test_multiprocess(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        # Two workers that have each served a request
+        script = (
+            'from prometheus_client import Counter;'
+            'Counter("cvconnect_test_total", "", ["view"]).labels("a").inc()'
+        )
+        for _ in range(2):
+            subprocess.check_call([sys.executable, '-c', script],
+                                  env=dict(os.environ, prometheus_multiproc_dir=directory))
+
+        with mock.patch.dict(os.environ, {'prometheus_multiproc_dir': directory}):
+            response = self.client.get('/api/metrics/')
+        self.assertEqual(self.sample(response.content.decode(), 'cvconnect_test_total', view='a'), 2)
+
+
+class BulkEditTests(APITestCase, ):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super(BulkEditTests, self).setUp()
+        autocomplete_index.clear()
+        self.matt = create_profile('matt')
+        self.python = Skill.objects.create(profile=self.matt, name='Python', proficiency=3)
+        self.java = Skill.objects.create(profile=self.matt, name='Java', proficiency=2)
+        self.client.force_authenticate(self.matt.user)
+
+    def post(self, part, **changes):
+        return self.client.post('/api/profiles/matt/{}/bulk/'.format(part), changes, format='json')
+
+    def test_skills(self):
+        self.client.get('/api/autocomplete/', {'q': 'j'})
+        etag = self.client.get('/api/profiles/matt/skills/')['ETag']
+
+        response = self.post('skills', create=[{'name': 'Go', 'proficiency': 4}],
+                             update=[{'id': self.python.pk, 'name': 'Python 3'}], delete=[self.java.pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([skill['name'] for skill in response.data['created']], ['Go'])
+        self.assertEqual(response.data['updated'][0]['proficiency'], 3)
+        self.assertEqual(response.data['deleted'], [self.java.pk])
+        self.assertEqual(sorted(Skill.objects.values_list('name', flat=True)), ['Go', 'Python 3'])
+
+        search = lambda query: [result['match'] for result in
+                                self.client.get('/api/search/{}/'.format(query)).data['results']]
+        self.assertEqual(search('Go'), ['Go'])
+        self.assertEqual(search('Python'), ['Python 3'])
+        self.assertEqual(search('Java'), [])
+
+        complete = lambda prefix: [c['text'] for c in self.client.get('/api/autocomplete/', {'q': prefix}).data]
+        self.assertEqual(complete('go'), ['Go'])
+        self.assertEqual(complete('python'), ['Python 3'])
+        self.assertEqual(complete('j'), [])
+
+        changed = self.client.get('/api/profiles/matt/skills/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data), 2)
+
+    def test_profile_cache_is_invalidated(self):
+        self.assertEqual(self.client.get('/api/profiles/matt/').data['current_position'], 'Not Employed')
+        response = self.post('employment', create=[{'location': 'Sydney', 'employer': 'Nozama', 'role': 'Engineer',
+                                                    'start_date': '2015-01-01'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'][0]['profile'], self.matt.pk)
+        self.assertEqual(self.client.get('/api/profiles/matt/').data['current_position'], 'Engineer')
+
+    def test_nothing_is_applied_unless_everything_is_valid(self):
+        david = create_profile('david')
+        other = Skill.objects.create(profile=david, name='C', proficiency=1)
+
+        response = self.post('skills', create=[{'name': 'Go', 'proficiency': 4}, {'name': 'Rust', 'proficiency': 9}],
+                             update=[{'id': other.pk, 'name': 'C++'}, {'id': self.python.pk, 'name': ''}],
+                             delete=[self.java.pk, self.java.pk, 'x'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['create'][0], {})
+        self.assertIn('proficiency', response.data['create'][1])
+        self.assertEqual(response.data['update'][0], {'id': ['Not found.']})
+        self.assertIn('name', response.data['update'][1])
+        self.assertEqual(response.data['delete'][0], {})
+        self.assertEqual(len([errors for errors in response.data['delete'] if errors]), 2)
+        self.assertEqual(sorted(Skill.objects.values_list('name', flat=True)), ['C', 'Java', 'Python'])
+
+    def test_updates_take_a_constant_number_of_queries(self):
+        def count(rows):
+            Skill.objects.all().delete()
+            skills = [Skill.objects.create(profile=self.matt, name='Skill', proficiency=1) for _ in range(rows)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post('skills', update=[{'id': skill.pk, 'proficiency': 2} for skill in skills])
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(count(4), count(40))
+
+    def test_only_the_owner_can_edit(self):
+        david = create_profile('david')
+        skill = Skill.objects.create(profile=david, name='C', proficiency=1)
+        response = self.client.post('/api/profiles/david/skills/bulk/', {'delete': [skill.pk]}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.post('skills', delete=[self.python.pk]).status_code, 404)
+        self.assertEqual(Skill.objects.count(), 3)
+
+    def test_ids_must_be_integers(self):
+        response = self.post('skills', update=[{'id': True, 'name': 'Go'}], delete=[True, str(self.java.pk)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['update'], [{'id': ['Not found.']}])
+        self.assertEqual(response.data['delete'], [{'id': ['Not found.']}, {'id': ['Not found.']}])
+
+    def test_body_must_be_an_object(self):
+        response = self.client.post('/api/profiles/matt/skills/bulk/', [{'name': 'Go'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(MAX_BULK_CHANGES=1)
+    def test_too_many_changes(self):
+        response = self.post('skills', delete=[self.python.pk, self.java.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Skill.objects.count(), 2)
@@ -0,0 +1,55 @@
+from io import BytesIO
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+
+# Largest first, as each thumbnail is shrunk from the one before it
+THUMBNAIL_SIZES = [512, 128, 64]
+
+
+def open_draft(upload):
+    """
+    Opens upload to be decoded at the smallest scale that is still larger
+    than the biggest thumbnail. Only the header has been read, and size is
+    what will be decoded.
+
+    draft() only works for JPEGs, so a full size photo is never decoded.
+    PNGs, GIFs and the like are decoded at full size, which is why
+    decoded_pixels() is checked against settings.MAX_IMAGE_PIXELS before
+    an upload is accepted.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    image.draft('RGB', (THUMBNAIL_SIZES[0], THUMBNAIL_SIZES[0]))
+    return image
+
+
+def decoded_pixels(upload):
+    """
+    Returns how many pixels make_thumbnails(upload) decodes, from its header
+    """
+    width, height = open_draft(upload).size
+    upload.seek(0)
+    return width * height
+
+
+def make_thumbnails(upload):
+    """
+    Returns a JPEG of upload fitting within each of THUMBNAIL_SIZES pixels
+    square, keyed by the matching ProfileImage field name.
+    """
+    image = open_draft(upload).convert('RGB')
+
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    ret = {}
+    for size in THUMBNAIL_SIZES:
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        thumbnail = BytesIO()
+        image.save(thumbnail, 'JPEG', quality=85)
+        ret['thumbnail_{}'.format(size)] = ContentFile(thumbnail.getvalue(), name='{}-{}.jpg'.format(name, size))
+
+    upload.seek(0)
+    return ret
@@ -0,0 +1,123 @@
+"""
+Home timelines: the posts of a user and everyone they are connected to.
+
+Timelines are written on fan-out: when a post is created a TimelineEntry is
+inserted for its author and for each of their connections, so reading a
+timeline is one range read on the (user, created, post) index however many
+connections there are. Authors with more than settings.TIMELINE_FANOUT_LIMIT
+connections are only written to their own timeline, and their posts are
+pulled straight from FeedPost and merged in when a connection reads theirs.
+Both sides go by Profile.connection_count, which the m2m_changed handler
+below keeps current, so telling which authors are pulled only looks at the
+reader's own connections.
+
+Posts are not copied onto a timeline retroactively when two profiles
+connect, but are taken off it when they disconnect.
+"""
+from django.conf import settings
+from django.db.models import Count, F
+from django.db.models.signals import post_save, m2m_changed
+
+from api.models import Profile, FeedPost, TimelineEntry
+from api.pagination import seek
+
+
+Connection = Profile.connections.through
+
+
+def fan_out(post):
+    """
+    Writes post onto its author's timeline and, unless they have too many
+    connections, onto each of their connections' timelines
+    """
+    busy = Profile.objects.filter(user_id=post.user_id, connection_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+    user_ids = set()
+    if not busy.exists():
+        user_ids.update(Connection.objects.filter(from_profile__user_id=post.user_id)
+                        .values_list('to_profile__user_id', flat=True))
+    user_ids.add(post.user_id)
+
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, created=post.created) for user_id in sorted(user_ids)],
+        batch_size=1000,
+    )
+
+
+def pulled_user_ids(user_id):
+    """
+    Returns the users connected to user_id whose posts are not fanned out
+    """
+    return list(Connection.objects.filter(from_profile__user_id=user_id,
+                                          to_profile__connection_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+                .values_list('to_profile__user_id', flat=True))
+
+
+def read_timeline(user_id, position, count):
+    """
+    Returns up to count TimelineEntries for user_id after position, a
+    (created, post id) pair, newest first. Entries for pulled posts are
+    built on the fly and not saved.
+    """
+    entries = list(seek(TimelineEntry.objects.filter(user_id=user_id), position, id_field='post_id')
+                   .select_related('post__user').order_by('-created', '-post_id')[:count])
+
+    pulled = pulled_user_ids(user_id)
+    if pulled:
+        posts = seek(FeedPost.objects.filter(user_id__in=pulled), position) \
+            .select_related('user').order_by('-created', '-id')[:count]
+        seen = set(entry.post_id for entry in entries)
+        entries.extend(TimelineEntry(user_id=user_id, post=post, created=post.created)
+                       for post in posts if post.pk not in seen)
+        entries.sort(key=timeline_position, reverse=True)
+
+    return entries[:count]
+
+
+def timeline_position(entry):
+    return entry.created, entry.post_id
+
+
+def post_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        fan_out(instance)
+
+
+def count_connections(profile_ids):
+    """
+    Stores how many connections each of profile_ids has
+    """
+    counts = dict(Connection.objects.filter(from_profile_id__in=profile_ids).values('from_profile_id')
+                  .annotate(count=Count('id')).values_list('from_profile_id', 'count'))
+    by_count = {}
+    for profile_id in profile_ids:
+        by_count.setdefault(counts.get(profile_id, 0), []).append(profile_id)
+    for count, ids in by_count.items():
+        Profile.objects.filter(pk__in=ids).update(connection_count=count)
+
+
+def connections_changed(sender, instance, action, pk_set, **kwargs):
+    if action == 'post_add':
+        # pk_set only holds new connections, but the mirrored rows are not
+        # written until after this signal, so count them in rather than up
+        Profile.objects.filter(pk=instance.pk).update(connection_count=F('connection_count') + len(pk_set))
+        Profile.objects.filter(pk__in=pk_set).update(connection_count=F('connection_count') + 1)
+    elif action == 'post_remove':
+        count_connections([instance.pk] + list(pk_set))
+    elif action == 'post_clear':
+        count_connections([instance.pk] + instance._cleared_ids)
+
+    if action == 'post_remove':
+        other_ids = Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+    elif action == 'pre_clear':
+        instance._cleared_ids = list(instance.connections.values_list('pk', flat=True))
+        other_ids = Profile.objects.filter(pk__in=instance._cleared_ids).values_list('user_id', flat=True)
+    else:
+        return
+
+    other_ids = list(other_ids)
+    TimelineEntry.objects.filter(user_id=instance.user_id, post__user_id__in=other_ids).delete()
+    TimelineEntry.objects.filter(user_id__in=other_ids, post__user_id=instance.user_id).delete()
+
+
+post_save.connect(post_saved, sender=FeedPost, dispatch_uid='timeline-fan-out')
+m2m_changed.connect(connections_changed, sender=Profile.connections.through, dispatch_uid='timeline-connections')
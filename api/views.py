@@ -1,25 +1,66 @@
+from django.conf import settings
 from django.db.models import Q
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 from django.core.validators import validate_email
-from django.http import Http404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.timesince import timesince
 from rest_framework import generics, status
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from collections import OrderedDict
+from time import time
 from uuid import uuid4
 
 from api.models import Profile, JobPosting, JobApplication, EducationDescription, EmploymentDescription, Skill, \
-    Company, SocialLink, CompanyManager, ForgottenPasswordToken, FeedPost
+    Company, SocialLink, CompanyManager, ForgottenPasswordToken, FeedPost, SearchEntry
 from api.serializers import UserSerializer, ProfileSerializer, JobPostingSerializer, JobApplicationSerializer, \
     EducationDescriptionSerializer, EmploymentDescriptionSerializer, SkillSerializer, CompanySerializer, \
-    SocialLinkSerializer, CompanyManagerSerializer, ProfileImageSerializer, FeedPostSerializer
+    SocialLinkSerializer, CompanyManagerSerializer, ProfileImageSerializer, FeedPostSerializer, \
+    SearchEntrySerializer, ProfileImageUploadSerializer, BulkEducationDescriptionSerializer, \
+    BulkEmploymentDescriptionSerializer, BulkSkillSerializer
+from api import profile_cache
+from api.authentication import QueryStringTokenAuthentication
+from api.autocomplete import index as autocomplete_index
+from api.bulk import apply_changes
+from api.conditional import conditional_get, versioned_id, profile_version, job_posting_version, company_version
+from api.events import get_broker, format_event, RETRY, KEEPALIVE
+from api.export import applicants_csv
+from api.graph import graph
+from api.metrics import latest as latest_metrics
+from api.outbox import queue_mail, queue_mass_mail
+from api.pagination import KeysetPagination, RankedPagination, SeekPagination
+from api.recommendations import recommend_profiles, recommend_similar_profiles
+from api.search import search
+from api.sparse import prune
+from api.streaming import StreamingListMixin
+from api.thumbnails import make_thumbnails
+from api.timeline import read_timeline, timeline_position
+
+
+def invite_email(profile, link, email):
+    """
+    Returns the subject, message, sender and recipients of an invite email
+    """
+    return (
+        'You got invited to CVConnect!',
+        'Hey, you just got invited to CVConnect by {}, click the following link to register {}'.format(
+            profile.preferred_name, link
+        ),
+        'no-reply@cvconnect.com',
+        [email, ],
+    )
 
 
-class UserList(generics.ListCreateAPIView, ):
+class UserList(StreamingListMixin, generics.ListCreateAPIView, ):
     serializer_class = UserSerializer
     model = User
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return User.objects.all()
@@ -80,9 +121,10 @@ class UserDetail(generics.RetrieveUpdateDestroyAPIView, ):
         return super(UserDetail, self).delete(request, *args, **kwargs)
 
 
-class ProfileList(generics.ListCreateAPIView, ):
+class ProfileList(StreamingListMixin, generics.ListCreateAPIView, ):
     serializer_class = ProfileSerializer
     model = Profile
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Profile.objects.all()
@@ -98,6 +140,15 @@ class ProfileDetail(generics.RetrieveUpdateDestroyAPIView, ):
         username = self.kwargs.get('username', None)
         return Profile.objects.filter(user__username=username)
 
+    @conditional_get('profile', profile_version)
+    def get(self, request, *args, **kwargs):
+        # conditional_get has already looked up the profile's id
+        entry = profile_cache.get_profile(versioned_id(request))
+        if entry is None:
+            raise Http404
+
+        return Response(prune(request, entry['profile']), status=200)
+
     def patch(self, request, *args, **kwargs):
         profile = self.get_queryset()
         if profile.exists():
@@ -117,40 +168,52 @@ class ProfileDetail(generics.RetrieveUpdateDestroyAPIView, ):
         return super(ProfileDetail, self).delete(request, *args, **kwargs)
 
 
-class ProfileRecommendations(generics.ListAPIView, ):
-    serializer_class = ProfileSerializer
-    model = Profile
-
-    def get_queryset(self):
-        # Just return 3 random profiles for the moment that aren't the user from the url
-        username = self.kwargs.get('username', None)
-        connection_pks = list(Profile.objects.get(user__username=username).connections.all().values_list('pk', flat=True))
-        connection_pks.append(Profile.objects.get(user__username=username).pk)
-        return Profile.objects.all().exclude(pk__in=connection_pks).order_by('?')[:3]
+class ProfileRecommendations(APIView, ):
+    """
+    Recommends profiles to connect with, ranked by mutual connections or,
+    with ?mode=skills, by how similar their skills are
+    """
 
     def get(self, request, *args, **kwargs):
 
-        queryset = self.get_queryset()
-        ret_data = []
+        username = self.kwargs.get('username', None)
+        profile = Profile.objects.filter(user__username=username)
+        if not profile.exists():
+            raise Http404
+        profile = profile.first()
 
-        for profile in queryset:
-            profile_serializer = ProfileSerializer(instance=profile)
-            profile_data = profile_serializer.data
+        try:
+            limit = min(int(request.query_params.get('limit', 3)), settings.MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=400)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1'}, status=400)
+
+        mode = request.query_params.get('mode', 'connections')
+        if mode == 'connections':
+            recommendations = recommend_profiles(profile, limit)
+            score_field = 'mutual_connections'
+        elif mode == 'skills':
+            recommendations = recommend_similar_profiles(profile, limit)
+            score_field = 'similarity'
+        else:
+            return Response({'error': 'mode must be connections or skills'}, status=400)
 
-            image = ProfileImageSerializer(instance=profile.image)
+        entries = profile_cache.get_profiles([recommended.pk for recommended, score in recommendations])
+        ret_data = []
 
-            if image.data['image'] is None:
-                profile_data['image'] = 'http://res.cloudinary.com/hjfb74ijq/image/upload/v1479381082/default_rutr05.jpg'
-            else:
-                profile_data['image'] = image.data['image']
+        for (recommended, score), entry in zip(recommendations, entries):
+            profile_data = profile_cache.with_image(entry)
+            profile_data[score_field] = score
             ret_data.append(profile_data)
 
-        return Response(ret_data, status=200)
+        return Response(prune(request, ret_data), status=200)
 
 
-class JobPostingList(generics.ListCreateAPIView, ):
+class JobPostingList(StreamingListMixin, generics.ListCreateAPIView, ):
     serializer_class = JobPostingSerializer
     model = JobPosting
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         recruiter = self.request.query_params.get('recruiter', None)
@@ -158,9 +221,9 @@ class JobPostingList(generics.ListCreateAPIView, ):
 
             user = User.objects.filter(username=recruiter)
             if user.exists():
-                return JobPosting.objects.filter(recruiter=user.first().pk)
+                return JobPosting.objects.filter(recruiter=user.first().pk).select_related('recruiter')
             return JobPosting.objects.none()
-        return JobPosting.objects.all()
+        return JobPosting.objects.select_related('recruiter')
 
 
 class JobPostingDetail(generics.RetrieveUpdateDestroyAPIView, ):
@@ -173,6 +236,11 @@ class JobPostingDetail(generics.RetrieveUpdateDestroyAPIView, ):
         job_id = self.kwargs.get('job_id', None)
         return JobPosting.objects.filter(id=job_id)
 
+    # The posting's age is rendered with timesince
+    @conditional_get('job_posting', job_posting_version, volatile=('created', timesince))
+    def get(self, request, *args, **kwargs):
+        return super(JobPostingDetail, self).get(request, *args, **kwargs)
+
     def patch(self, request, *args, **kwargs):
         job_posting = self.get_queryset()
         if job_posting.exists():
@@ -204,9 +272,10 @@ class ProfileApplicationIDs(APIView, ):
         return Response(applications, status=200)
 
 
-class ProfileApplicationList(generics.ListAPIView, ):
+class ProfileApplicationList(StreamingListMixin, generics.ListAPIView, ):
     serializer_class = JobApplicationSerializer
     model = JobApplication
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         username = self.kwargs.get('username', None)
@@ -217,9 +286,10 @@ class ProfileApplicationList(generics.ListAPIView, ):
         return applications
 
 
-class JobApplicationList(generics.ListCreateAPIView, ):
+class JobApplicationList(StreamingListMixin, generics.ListCreateAPIView, ):
     serializer_class = JobApplicationSerializer
     model = JobApplication
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         job_id = self.kwargs.get('job_id', None)
@@ -231,6 +301,26 @@ class JobApplicationList(generics.ListCreateAPIView, ):
         return JobApplication.objects.filter(job_posting_id=job_id)
 
 
+class JobApplicationExport(APIView, ):
+    """
+    Streams the applicants for a job posting to its recruiter as CSV, with
+    their name, username, current position and company, skills and the
+    status of their application
+    """
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request, *args, **kwargs):
+
+        job_id = self.kwargs.get('job_id', None)
+        recruiter = JobPosting.objects.filter(id=job_id).values_list('recruiter_id', flat=True).first()
+        if recruiter is None or recruiter != request.user.pk:
+            raise Http404
+
+        response = StreamingHttpResponse(applicants_csv(job_id), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="job-{}-applicants.csv"'.format(job_id)
+        return response
+
+
 class JobApplicationDetail(generics.RetrieveUpdateDestroyAPIView, ):
     serializer_class = JobApplicationSerializer
     model = JobApplication
@@ -284,18 +374,64 @@ class InviteViaEmail(APIView, ):
         if link is None or not isinstance(link, str):
             return Response({'error': 'link field must be a string'})
 
-        send_mail(
-            'You got invited to CVConnect!',
-            'Hey, you just got invited to CVConnect by {}, click the following link to register {}'.format(
-                profile.preferred_name, link
-            ),
-            'no-reply@cvconnect.com',
-            [email, ],
-            fail_silently=False,
-        )
+        queue_mail(*invite_email(profile, link, email))
         return Response({'success': 'email sent'}, status=200)
 
 
+class BulkInviteViaEmail(APIView, ):
+    """
+    Sends invite emails to a list of addresses, skipping invalid addresses,
+    duplicates and people who have already registered. Returns what happened
+    to each address, in the order they were given.
+    """
+
+    def post(self, request, *args, **kwargs):
+
+        emails = request.data.get('emails', None)
+        link = request.data.get('link', None)
+        user = request.user
+
+        profile = Profile.objects.get(user=user)
+
+        if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+            return Response({'error': 'emails field must be a list of email addresses'}, status=400)
+
+        if len(emails) > settings.MAX_BULK_INVITES:
+            return Response({'error': 'at most {} emails can be sent at once'.format(settings.MAX_BULK_INVITES)},
+                            status=400)
+
+        if link is None or not isinstance(link, str):
+            return Response({'error': 'link field must be a string'}, status=400)
+
+        # The result for each email in the order they were given, and the
+        # position of the first copy of each valid address
+        results = []
+        seen = set()
+        valid = OrderedDict()
+        for i, email in enumerate(emails):
+            key = email.strip().lower()
+            if key in seen:
+                results.append('duplicate')
+                continue
+            seen.add(key)
+            try:
+                validate_email(email.strip())
+            except ValidationError:
+                results.append('invalid')
+                continue
+            valid[key] = i
+            results.append('sent')
+
+        registered = User.objects.annotate(lower_email=Lower('email')) \
+            .filter(lower_email__in=list(valid)).values_list('lower_email', flat=True).distinct()
+        for key in registered:
+            results[valid.pop(key)] = 'already registered'
+
+        queue_mass_mail(invite_email(profile, link, emails[i].strip()) for i in valid.values())
+        results = [OrderedDict([('email', email), ('result', result)]) for email, result in zip(emails, results)]
+        return Response({'results': results}, status=200)
+
+
 class ForgottenPasswordEmail(APIView, ):
     """
     Sends a email to request a password reset
@@ -326,36 +462,29 @@ class ForgottenPasswordEmail(APIView, ):
         link = link + '?token=' + str(forgot_pass_token.token)
         print(link)
 
-        send_mail(
+        queue_mail(
             'Reset your CVConnect password!',
             'Hey {}, you just requested a password reset for CVConnect, click the following link to reset your password {}'.format(
                 profile.preferred_name, link
             ),
             'no-reply@cvconnect.com',
             [email, ],
-            fail_silently=False,
         )
         return Response({'success': 'email sent'}, status=200)
 
 
 class ProfileImageList(APIView, ):
+    parser_classes = (JSONParser, MultiPartParser)
 
     def get(self, request, *args, **kwargs):
 
         username = kwargs.get('username')
-        profile = Profile.objects.filter(user__username=username)
-        if profile.exists():
-            profile = profile.first()
-        else:
+        entry = profile_cache.get_profile(
+            Profile.objects.filter(user__username=username).values_list('pk', flat=True).first())
+        if entry is None:
             raise Http404
 
-        image = ProfileImageSerializer(instance=profile.image)
-
-        ret = image.data
-        if ret['image'] is None:
-            ret['image'] = 'http://res.cloudinary.com/hjfb74ijq/image/upload/v1479381082/default_rutr05.jpg'
-
-        return Response(ret, status=200)
+        return Response(prune(request, entry['image']), status=200)
 
     def post(self, request, *args, **kwargs):
 
@@ -366,10 +495,19 @@ class ProfileImageList(APIView, ):
         else:
             raise Http404
 
+        # Multipart uploads are spooled to disk as they arrive (see
+        # FILE_UPLOAD_HANDLERS), JSON uploads carry the image Base64 encoded
+        if request.content_type.startswith('multipart/'):
+            image = ProfileImageUploadSerializer(data=request.data)
+        else:
+            image = ProfileImageSerializer(data=request.data)
+
         # Create the image
-        image = ProfileImageSerializer(data=request.data)
         if image.is_valid():
-            image.save()
+            if image.validated_data.get('image', None) is not None:
+                image.save(**make_thumbnails(image.validated_data['image']))
+            else:
+                image.save()
             profile.image = image.instance
             profile.save()
         else:
@@ -400,65 +538,39 @@ class ResetPassword(APIView, ):
         return Response({'success': 'password reset'}, status=200)
 
 
-class Search(APIView, ):
+class Search(generics.ListAPIView, ):
     """
-    Returns a bunch of objects with links to detail pages
+    Returns a page of objects with links to detail pages, best matches first
+    """
+    serializer_class = SearchEntrySerializer
+    model = SearchEntry
+    pagination_class = RankedPagination
+
+    def get_queryset(self):
+        query = self.kwargs.get('query_string', None)
+        return search(query)
+
+
+class Autocomplete(APIView, ):
+    """
+    Returns completions for the start of a search query from the in-memory
+    autocomplete index, without touching the database
     """
 
     def get(self, request, *args, **kwargs):
 
-        query = self.kwargs.get('query_string', None)
+        prefix = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), settings.MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=400)
 
-        objs = []
-        if query is not None:
-            profiles = Profile.objects.filter(full_name__contains=query)
-            jobs = JobPosting.objects.filter(position__contains=query)
-            skills = Skill.objects.filter(name__contains=query)
-            locations = Profile.objects.filter(country__contains=query)
-        else:
-            profiles = Profile.objects.all()
-            jobs = JobPosting.objects.all()
-            skills = Skill.objects.all()
-            locations = Profile.objects.all()
-
-        for profile in profiles:
-            objs.append({
-                "type": "profiles",
-                "subtype": "profiles",
-                "id": profile.user.username,
-                "visible_id": profile.full_name,
-                "image": ProfileImageSerializer(profile.image).to_representation(profile.image)['image'],
-                "match": profile.full_name
-            })
-
-        for job in jobs:
-            objs.append({
-                "type": "jobs",
-                "subtype": "jobs",
-                "id": job.id,
-                "visible_id": job.position + " at " + job.company,
-                "match": job.position + " at " + job.company
-            })
-
-        for skill in skills:
-            objs.append({
-                "type": "profiles",
-                "subtype": "skills",
-                "id": skill.profile.user.username,
-                "visible_id": skill.profile.full_name,
-                "match": skill.name
-            })
-
-        for location in locations:
-            objs.append({
-                "type": "profiles",
-                "subtype": "locations",
-                "id": location.user.username,
-                "visible_id": location.full_name,
-                "match": location.country
-            })
-
-        return Response(objs, status=200)
+        if not prefix.strip():
+            return Response([], status=200)
+
+        completions = autocomplete_index.complete(prefix, limit)
+        return Response(prune(request, [OrderedDict([('text', text), ('type', kind)]) for text, kind in completions]),
+                        status=200)
 
 
 class RegisterConnection(APIView, ):
@@ -492,42 +604,120 @@ class RegisterConnection(APIView, ):
         return Response({"success": "connected"}, status=200)
 
 
-class ConnectionList(generics.ListAPIView, ):
-    serializer_class = ProfileSerializer
-    model = Profile
+class ConnectionList(APIView, ):
 
-    def get_queryset(self):
+    def get(self, request, *args, **kwargs):
         # Only get connections for the profile that the endpoint hits
         # E.g. /api/profiles/matt/connections/ only returns matts connections
 
         username = self.kwargs.get('username', None)
-        if username is None:
-            return Profile.objects.none()
+        connection_ids = Profile.connections.through.objects.filter(from_profile__user__username=username) \
+            .order_by('to_profile_id').values_list('to_profile_id', flat=True)
+
+        ret_data = [profile_cache.with_image(entry) for entry in profile_cache.get_profiles(list(connection_ids))]
+        return Response(prune(request, ret_data), status=200)
 
-        profile = Profile.objects.filter(user__username=username)
-        if not profile.exists():
-            return Profile.objects.none()
 
-        return profile.first().connections.all()
+class ProfileFull(APIView, ):
+    """
+    Returns a profile with its image, skills, education, employment,
+    connections and latest feed posts, everything a profile page shows, in
+    one response. ?include= takes a comma separated list of the sections to
+    return, all of them by default, and ?fields= applies to the profile and
+    its connections.
+    """
+    sections = ['image', 'skills', 'education', 'employment', 'connections', 'feedposts']
+
+    # The related rows to prefetch for each section
+    prefetches = {
+        'skills': 'skill_set',
+        'education': 'educationdescription_set',
+        'employment': 'employmentdescription_set',
+    }
 
     def get(self, request, *args, **kwargs):
 
-        queryset = self.get_queryset()
-        ret_data = []
+        include = request.query_params.get('include', None)
+        include = self.sections if include is None else [section for section in include.split(',') if section]
+        unknown = [section for section in include if section not in self.sections]
+        if unknown:
+            return Response({'error': 'include must be a comma separated list of {}'.format(', '.join(self.sections))},
+                            status=400)
 
-        for profile in queryset:
-            profile_serializer = ProfileSerializer(instance=profile)
-            profile_data = profile_serializer.data
+        username = self.kwargs.get('username', None)
+        profile = Profile.objects.filter(user__username=username).select_related('user', 'image') \
+            .prefetch_related(*[self.prefetches[section] for section in include if section in self.prefetches]) \
+            .first()
+        if profile is None:
+            raise Http404
 
-            image = ProfileImageSerializer(instance=profile.image)
+        # The profile and its connections are looked up in the cache together
+        connection_ids = []
+        if 'connections' in include:
+            connection_ids = list(Profile.connections.through.objects.filter(from_profile=profile)
+                                  .order_by('to_profile_id').values_list('to_profile_id', flat=True))
+        entries = profile_cache.get_profiles([profile.pk] + connection_ids)
+        entry = entries[0]
+
+        ret = OrderedDict([('profile', prune(request, entry['profile']))])
+        if 'image' in include:
+            ret['image'] = entry['image']
+        if 'skills' in include:
+            ret['skills'] = SkillSerializer(profile.skill_set.all(), many=True).data
+        if 'education' in include:
+            ret['education'] = EducationDescriptionSerializer(profile.educationdescription_set.all(), many=True).data
+        if 'employment' in include:
+            ret['employment'] = EmploymentDescriptionSerializer(profile.employmentdescription_set.all(),
+                                                                many=True).data
+        if 'connections' in include:
+            ret['connections'] = prune(request, [profile_cache.with_image(connection) for connection in entries[1:]])
+        if 'feedposts' in include:
+            # The latest page of posts, older ones are paged through at /feedposts/
+            posts = list(FeedPost.objects.filter(user_id=profile.user_id).order_by('-created', '-id')
+                         [:SeekPagination.page_size])
+            for post in posts:
+                post._author, post.user = profile, profile.user
+            ret['feedposts'] = FeedPostSerializer(posts, many=True).data
 
-            if image.data['image'] is None:
-                profile_data['image'] = 'http://res.cloudinary.com/hjfb74ijq/image/upload/v1479381082/default_rutr05.jpg'
-            else:
-                profile_data['image'] = image.data['image']
-            ret_data.append(profile_data)
+        return Response(ret, status=200)
+
+
+class ConnectionPath(APIView, ):
+    """
+    Base for views about how two profiles are connected
+    """
 
-        return Response(ret_data, status=200)
+    def get_profile_ids(self):
+        usernames = [self.kwargs.get('username', None), self.kwargs.get('other', None)]
+        profile_ids = dict(Profile.objects.filter(user__username__in=usernames).values_list('user__username', 'pk'))
+        if len(profile_ids) != len(set(usernames)):
+            raise Http404
+        return [profile_ids[username] for username in usernames]
+
+
+class MutualConnectionList(ConnectionPath, ):
+    """
+    Returns the usernames of the connections two profiles have in common
+    """
+
+    def get(self, request, *args, **kwargs):
+
+        first, second = self.get_profile_ids()
+        mutual = graph.mutual(first, second)
+        usernames = sorted(Profile.objects.filter(pk__in=mutual).values_list('user__username', flat=True))
+        return Response({'count': len(usernames), 'mutual': usernames}, status=200)
+
+
+class ConnectionDistance(ConnectionPath, ):
+    """
+    Returns the degrees of separation between two profiles, or null if they
+    are more than six connections apart
+    """
+
+    def get(self, request, *args, **kwargs):
+
+        first, second = self.get_profile_ids()
+        return Response({'distance': graph.distance(first, second)}, status=200)
 
 
 class EducationDescriptionList(generics.ListCreateAPIView, ):
@@ -541,6 +731,10 @@ class EducationDescriptionList(generics.ListCreateAPIView, ):
         else:
             return EducationDescription.objects.none()
 
+    @conditional_get('education', profile_version)
+    def get(self, request, *args, **kwargs):
+        return super(EducationDescriptionList, self).get(request, *args, **kwargs)
+
 
 class EducationDescriptionDetail(generics.RetrieveUpdateDestroyAPIView, ):
     serializer_class = EducationDescriptionSerializer
@@ -567,6 +761,10 @@ class EmploymentDescriptionList(generics.ListCreateAPIView, ):
         else:
             return EmploymentDescription.objects.none()
 
+    @conditional_get('employment', profile_version)
+    def get(self, request, *args, **kwargs):
+        return super(EmploymentDescriptionList, self).get(request, *args, **kwargs)
+
 
 class EmploymentDescriptionDetail(generics.RetrieveUpdateDestroyAPIView, ):
     serializer_class = EmploymentDescriptionSerializer
@@ -593,6 +791,10 @@ class SkillList(generics.ListCreateAPIView, ):
         else:
             return Skill.objects.none()
 
+    @conditional_get('skills', profile_version)
+    def get(self, request, *args, **kwargs):
+        return super(SkillList, self).get(request, *args, **kwargs)
+
 
 class SkillDetail(generics.RetrieveUpdateDestroyAPIView, ):
     serializer_class = SkillSerializer
@@ -608,9 +810,112 @@ class SkillDetail(generics.RetrieveUpdateDestroyAPIView, ):
             return Skill.objects.none()
 
 
-class CompanyList(generics.ListCreateAPIView, ):
+def is_id(value):
+    # bool is a subclass of int
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class ProfilePartBulk(APIView, ):
+    """
+    Creates, updates and deletes many of a profile's skills, education or
+    employment rows in one request. The body holds a 'create' list of new
+    rows, an 'update' list of changes to rows, each with its id, and a
+    'delete' list of ids. Every change is validated before any is applied,
+    and then they are all applied in one transaction.
+    """
+    model = None
+    serializer_class = None
+
+    def post(self, request, *args, **kwargs):
+
+        username = self.kwargs.get('username', None)
+        profile = Profile.objects.filter(user__username=username).select_related('user').first()
+        if profile is None or request.user != profile.user:
+            raise Http404
+
+        if not isinstance(request.data, dict):
+            return Response({'error': 'expected an object with create, update and delete fields'}, status=400)
+
+        create = request.data.get('create', [])
+        update = request.data.get('update', [])
+        delete = request.data.get('delete', [])
+        if not all(isinstance(changes, list) for changes in [create, update, delete]):
+            return Response({'error': 'create, update and delete fields must be lists'}, status=400)
+
+        if len(create) + len(update) + len(delete) > settings.MAX_BULK_CHANGES:
+            return Response({'error': 'at most {} changes can be made at once'.format(settings.MAX_BULK_CHANGES)},
+                            status=400)
+
+        ids = [item['id'] for item in update if isinstance(item, dict) and is_id(item.get('id'))]
+        ids += [pk for pk in delete if is_id(pk)]
+        existing = {obj.pk: obj for obj in self.model.objects.filter(profile=profile, pk__in=ids)}
+
+        created, create_errors = [], []
+        for item in create:
+            serializer = self.serializer_class(data=item)
+            if serializer.is_valid():
+                created.append(self.model(profile=profile, **serializer.validated_data))
+            create_errors.append(serializer.errors)
+
+        updated, update_errors, seen = [], [], set()
+        for item in update:
+            pk = item.get('id', None) if isinstance(item, dict) else None
+            if not is_id(pk) or pk not in existing:
+                update_errors.append({'id': ['Not found.']})
+                continue
+            if pk in seen:
+                update_errors.append({'id': ['Updated more than once.']})
+                continue
+            seen.add(pk)
+
+            serializer = self.serializer_class(existing[pk], data=item, partial=True)
+            if serializer.is_valid():
+                for field, value in serializer.validated_data.items():
+                    setattr(existing[pk], field, value)
+                updated.append((existing[pk], list(serializer.validated_data)))
+            update_errors.append(serializer.errors)
+
+        deleted, delete_errors = [], []
+        for pk in delete:
+            if not is_id(pk) or pk not in existing:
+                delete_errors.append({'id': ['Not found.']})
+            elif pk in seen:
+                delete_errors.append({'id': ['Updated and deleted at once.']})
+            else:
+                seen.add(pk)
+                deleted.append(pk)
+                delete_errors.append({})
+
+        if any(create_errors + update_errors + delete_errors):
+            return Response({'create': create_errors, 'update': update_errors, 'delete': delete_errors}, status=400)
+
+        apply_changes(profile, self.model, created, updated, deleted)
+        return Response({
+            'created': self.serializer_class(created, many=True).data,
+            'updated': self.serializer_class([obj for obj, fields in updated], many=True).data,
+            'deleted': deleted,
+        }, status=200)
+
+
+class EducationDescriptionBulk(ProfilePartBulk, ):
+    model = EducationDescription
+    serializer_class = BulkEducationDescriptionSerializer
+
+
+class EmploymentDescriptionBulk(ProfilePartBulk, ):
+    model = EmploymentDescription
+    serializer_class = BulkEmploymentDescriptionSerializer
+
+
+class SkillBulk(ProfilePartBulk, ):
+    model = Skill
+    serializer_class = BulkSkillSerializer
+
+
+class CompanyList(StreamingListMixin, generics.ListCreateAPIView, ):
     serializer_class = CompanySerializer
     model = Company
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Company.objects.all()
@@ -626,10 +931,15 @@ class CompanyDetail(generics.RetrieveUpdateDestroyAPIView, ):
         manages = CompanyManager.objects.filter(profile__user=self.request.user).values_list('company_id', flat=True)
         return Company.objects.filter(pk__in=manages)
 
+    @conditional_get('company', company_version)
+    def get(self, request, *args, **kwargs):
+        return super(CompanyDetail, self).get(request, *args, **kwargs)
+
 
 class FeedPostList(generics.ListCreateAPIView, ):
     serializer_class = FeedPostSerializer
     model = FeedPost
+    pagination_class = SeekPagination
 
     def get_queryset(self):
 
@@ -637,10 +947,70 @@ class FeedPostList(generics.ListCreateAPIView, ):
         if username is None:
             raise Http404
 
-        return FeedPost.objects.filter(user__username=username).order_by('-created')
+        return FeedPost.objects.filter(user__username=username).order_by('-created', '-id')
+
+
+class HomeTimeline(APIView, ):
+    """
+    Returns the posts of a user and their connections, newest first
+    """
+
+    def get(self, request, *args, **kwargs):
+        username = self.kwargs.get('username', None)
+        user = User.objects.filter(username=username).values_list('pk', flat=True).first()
+        if user is None:
+            raise Http404
+
+        paginator = SeekPagination()
+        entries = paginator.paginate(
+            lambda position, count: read_timeline(user, position, count),
+            request,
+            key=timeline_position,
+        )
+        serializer = FeedPostSerializer([entry.post for entry in entries], many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
 
+class EventStream(APIView, ):
+    """
+    Streams server-sent events about new feed posts from the user's
+    connections and changes to the status of their job applications
+    """
+
+    authentication_classes = (TokenAuthentication, QueryStringTokenAuthentication)
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request, *args, **kwargs):
+        subscription = get_broker().subscribe(request.user.pk)
+        response = StreamingHttpResponse(self.stream(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, subscription):
+        # Give the worker back before gunicorn's timeout, the client
+        # reconnects on its own
+        deadline = time() + settings.EVENTS_STREAM_TIMEOUT
+        try:
+            yield RETRY
+            while time() < deadline:
+                event = subscription.get(min(settings.EVENTS_KEEPALIVE, max(deadline - time(), 0)))
+                yield KEEPALIVE if event is None else format_event(event)
+        finally:
+            subscription.close()
 
-class UserJobPostingsList(generics.ListAPIView, ):
+
+class Metrics(APIView, ):
+    """
+    Returns the metrics of every worker in the Prometheus text format
+    """
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(latest_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class UserJobPostingsList(StreamingListMixin, generics.ListAPIView, ):
     serializer_class = JobPostingSerializer
     model = JobPosting
 
@@ -649,11 +1019,7 @@ class UserJobPostingsList(generics.ListAPIView, ):
         if username is None:
             raise Http404
 
-        user = User.objects.filter(username=username)
-        if user.exists():
-            return JobPosting.objects.filter(recruiter=user.first().pk)
-
-        return JobPosting.objects.none()
+        return JobPosting.objects.filter(recruiter__username=username).select_related('recruiter')
 
 
 class ChangePassword(APIView, ):
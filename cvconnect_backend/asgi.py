@@ -0,0 +1,163 @@
+"""
+ASGI config for cvconnect_backend project.
+
+Serves the server-sent event stream at /api/events/ on the event loop, so an
+open stream does not hold a thread, and hands every other request to the
+WSGI application through asgiref's WsgiToAsgi, which runs it on a thread
+pool of ASGI_THREADS threads. It exposes an ASGI 3 callable as a
+module-level variable named ``application``, which the Procfile serves with
+gunicorn's uvicorn worker.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from cvconnect_backend.wsgi import application as wsgi_application
+
+from asgiref.wsgi import WsgiToAsgi
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.events import get_broker, format_event, RETRY, KEEPALIVE
+
+
+EVENTS_PATH = '/api/events/'
+
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_THREADS', 8)))
+
+
+def run_sync(function, *args):
+    """
+    Runs function on the thread pool, closing the thread's database
+    connection afterwards if it has gone stale
+    """
+    def call():
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+
+    return asyncio.get_event_loop().run_in_executor(executor, call)
+
+
+def closing_application(environ, start_response):
+    """
+    The WSGI application, closing each response once it has been sent.
+    WsgiToAsgi does not, and Django only sends request_finished, which
+    closes the database connection, as a response is closed.
+    """
+    response = wsgi_application(environ, start_response)
+    try:
+        for chunk in response:
+            yield chunk
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+
+wsgi = WsgiToAsgi(closing_application)
+
+
+def cors_headers(scope):
+    """
+    Returns the headers CorsMiddleware would add to a response to the
+    request, which the event stream does not go through
+    """
+    request = HttpRequest()
+    request.method = scope['method']
+    request.path = request.path_info = scope['path']
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'origin':
+            request.META['HTTP_ORIGIN'] = value.decode('latin1')
+
+    response = CorsMiddleware().process_response(request, HttpResponse())
+    return [(name.lower().encode('latin1'), value.encode('latin1'))
+            for name, value in response.items() if name.lower().startswith('access-control-')]
+
+
+def authenticate(scope):
+    """
+    Returns the user for the token in the Authorization header or ?token=
+    parameter, or None
+    """
+    key = parse_qs(scope.get('query_string', b'').decode('latin1')).get('token', [None])[0]
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'authorization':
+            parts = value.decode('latin1').split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                key = parts[1]
+
+    if not key:
+        return None
+    try:
+        return TokenAuthentication().authenticate_credentials(key)[0]
+    except AuthenticationFailed:
+        return None
+
+
+async def events(scope, receive, send):
+    cors = cors_headers(scope)
+    user = await run_sync(authenticate, scope)
+    if user is None:
+        await send({'type': 'http.response.start', 'status': 401,
+                    'headers': [(b'content-type', b'application/json')] + cors})
+        await send({'type': 'http.response.body',
+                    'body': b'{"detail":"Authentication credentials were not provided."}'})
+        return
+
+    loop = asyncio.get_event_loop()
+    queue = asyncio.Queue()
+    subscription = await run_sync(
+        get_broker().subscribe, user.pk, lambda event: loop.call_soon_threadsafe(queue.put_nowait, event))
+
+    disconnected = asyncio.ensure_future(receive())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ] + cors})
+        await send({'type': 'http.response.body', 'body': RETRY.encode('utf8'), 'more_body': True})
+
+        while True:
+            event = asyncio.ensure_future(queue.get())
+            await asyncio.wait([event, disconnected], timeout=settings.EVENTS_KEEPALIVE,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                event.cancel()
+                return
+
+            if event.done():
+                body = format_event(event.result())
+            else:
+                event.cancel()
+                body = KEEPALIVE
+            await send({'type': 'http.response.body', 'body': body.encode('utf8'), 'more_body': True})
+    finally:
+        subscription.close()
+        disconnected.cancel()
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == EVENTS_PATH and scope['method'] == 'GET':
+        await events(scope, receive, send)
+    elif scope['type'] == 'http':
+        await wsgi(scope, receive, send)
@@ -0,0 +1,25 @@
+"""
+Gunicorn config, see the Procfile.
+
+Workers keep their Prometheus metrics in files in prometheus_multiproc_dir
+so that /api/metrics/ can add them up across workers (see api/metrics.py).
+The directory is emptied as gunicorn starts, and the files of workers that
+exit are merged into the totals.
+"""
+import os
+import shutil
+
+# prometheus_client picks where to keep metrics as it is imported, which
+# the workers inherit from here
+metrics_dir = os.environ.setdefault('prometheus_multiproc_dir', '/tmp/cvconnect_metrics')
+
+from prometheus_client import multiprocess  # noqa
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
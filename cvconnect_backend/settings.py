@@ -48,10 +48,94 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
-    )
+    ),
+    # Only the views that set a pagination_class are paginated
+    'DEFAULT_PAGINATION_CLASS': None,
+    'PAGE_SIZE': int(os.environ.get('PAGE_SIZE', 25)),
+}
+
+# With REDIS_URL set (e.g. by the Heroku Redis add-on) every worker on every
+# dyno shares one cache, so a cached profile invalidated by one is gone for
+# all of them. Without it a file based cache is only shared by the workers on
+# one machine: those on other dynos never see the invalidation and keep
+# serving their copy until PROFILE_CACHE_TIMEOUT runs out, which is
+# therefore kept short.
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+    PROFILE_CACHE_TIMEOUT = 60 * 60
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', '/tmp/cvconnect_cache'),
+        }
+    }
+    PROFILE_CACHE_TIMEOUT = 60
+
+# How many seconds a serialized profile may stay cached
+PROFILE_CACHE_TIMEOUT = int(os.environ.get('PROFILE_CACHE_TIMEOUT', PROFILE_CACHE_TIMEOUT))
+
+# Upper bound for the ?page_size= parameter on paginated list endpoints
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+# How many rows streamed list responses (?format=ndjson or json-stream)
+# serialize at a time, see api/streaming.py
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 500))
+
+# How many seconds a worker's autocomplete index may serve before it is
+# rebuilt to pick up changes made through other workers
+AUTOCOMPLETE_MAX_AGE = int(os.environ.get('AUTOCOMPLETE_MAX_AGE', 300))
+
+# How many seconds a worker's copy of the connection graph may serve before
+# it is reloaded to pick up connections made through other workers
+CONNECTION_GRAPH_MAX_AGE = int(os.environ.get('CONNECTION_GRAPH_MAX_AGE', 300))
+
+# Posts by users with more connections than this are not copied onto each of
+# their connections' home timelines, they are merged in when a timeline is read
+TIMELINE_FANOUT_LIMIT = int(os.environ.get('TIMELINE_FANOUT_LIMIT', 1000))
+
+# Seconds between keepalive comments on /api/events/, and how long the WSGI
+# version of the stream may hold a worker before the client has to reconnect
+EVENTS_KEEPALIVE = 15
+EVENTS_STREAM_TIMEOUT = 50
+
+# Return each request's SQL query count and time in X-Query-Count and
+# X-Query-Time headers, instead of logging them to the api.queries logger
+QUERY_COUNT_HEADERS = DEBUG
+
+# Requests from staff users with an `X-Profile: 1` header, and this fraction
+# of all requests, are run under cProfile and saved to PROFILING_DIR, see
+# `python manage.py request_profiles`. Only the newest PROFILING_MAX_CAPTURES
+# are kept
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/cvconnect_profiles')
+PROFILING_MAX_CAPTURES = int(os.environ.get('PROFILING_MAX_CAPTURES', 200))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.environ.get('API_LOG_LEVEL', 'INFO'),
+        },
+    },
 }
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -60,6 +144,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'cvconnect_backend.urls'
@@ -142,6 +227,26 @@ EMAIL_HOST_PASSWORD = os.environ['EMAIL_HOST_PASSWORD']
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 
+# Emails are queued in the outbox and sent by `python manage.py send_queued_mail`.
+# A failed email is retried after OUTBOX_RETRY_DELAY seconds, doubling each
+# time, until it has been tried OUTBOX_MAX_ATTEMPTS times.
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 60
+
+# The most addresses that can be invited in one request to /api/send-invites/
+MAX_BULK_INVITES = 500
+
+# The most creates, updates and deletes that can be sent in one request to the
+# bulk skill, education and employment endpoints
+MAX_BULK_CHANGES = 200
+
 MEDIA_URL = '/media/'
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
-CLOUDINARY_URL = os.environ['CLOUDINARY_URL']
\ No newline at end of file
+CLOUDINARY_URL = os.environ['CLOUDINARY_URL']
+
+# Always stream uploads to a temporary file rather than holding them in memory
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# The most pixels a profile image upload may decode to, read from its header.
+# JPEGs are decoded at a reduced scale, so this mostly limits other formats
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 25 * 1000 * 1000))
@@ -12,4 +12,16 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cvconnect_backend.settings")
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+# Build the autocomplete index and connection graph as the worker starts
+# instead of on the first request. If the database is unavailable they are
+# built on first use instead.
+from django.db import DatabaseError
+from api.autocomplete import index
+from api.graph import graph
+
+try:
+    index.build()
+    graph.build()
+except DatabaseError:
+    pass